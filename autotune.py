@@ -0,0 +1,247 @@
+"""
+Concurrency auto-tuning
+Hill-climbs worker counts and batch sizes on measured throughput during a run
+
+- `AutoTuner` measures units/s (bytes or messages) over short windows, keeps moving a
+  knob in the direction that improves throughput and reverses when it stops helping
+- FloodWait halves the knob at once; rising latency without more throughput steps it down
+- The best value is saved per account + destination in autotune_state.json and used as
+  the starting point next time
+- `AdjustableLimiter` is a semaphore whose limit can change while tasks are waiting
+"""
+import asyncio
+import collections
+import contextlib
+import json
+import os
+import time
+
+STATE_FILE = 'autotune_state.json'
+
+
+class AdjustableLimiter:
+    """Semaphore-like limiter whose limit can be raised or lowered at runtime"""
+
+    def __init__(self, limit):
+        self._limit = max(1, int(limit))
+        self._active = 0
+        self._waiters = collections.deque()
+
+    @property
+    def limit(self):
+        return self._limit
+
+    def set_limit(self, limit):
+        """Change the limit; lowering it lets running holders finish normally"""
+        self._limit = max(1, int(limit))
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._active < self._limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self._active += 1
+                fut.set_result(None)
+
+    async def acquire(self):
+        if self._active < self._limit and not self._waiters:
+            self._active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot was handed over just as we were cancelled
+                self.release()
+            raise
+
+    def release(self):
+        self._active -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class TuneStore:
+    """Best settings per account/destination/knob, kept in a small JSON file"""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                self.data = json.load(fh)
+        except (OSError, ValueError):
+            self.data = {}
+
+    @staticmethod
+    def key(account, destination, name):
+        return f'{account}|{destination}|{name}'
+
+    def get(self, account, destination, name):
+        entry = self.data.get(self.key(account, destination, name))
+        return entry['value'] if entry else None
+
+    def put(self, account, destination, name, value, rate):
+        self.data[self.key(account, destination, name)] = {
+            'value': value,
+            'rate': round(rate, 3) if rate else None,
+            'updated': int(time.time()),
+        }
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(self.data, fh, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class AutoTuner:
+    """
+    Hill-climb one integer knob on observed throughput
+
+    Args:
+        name: Knob name, e.g. 'upload_workers' or 'forward_batch'
+        initial: Starting value (a saved value for account/destination wins)
+        minimum, maximum: Bounds for the knob
+        step: How far to move per window
+        window: Seconds of work to measure before each decision
+        account, destination: Key for saved settings (saving is off if account is None)
+        on_change: Optional callback `on_change(new_value)`
+        store: TuneStore (defaults to autotune_state.json in the working folder)
+    """
+
+    threshold = 0.05  # Required relative gain before a move counts as better
+    latency_factor = 1.5  # Latency growth that triggers a step down
+    hold_windows = 3  # Windows to stay at the best value after two misses in a row
+
+    def __init__(self, name, initial, minimum, maximum, step=1, window=10.0,
+                 account=None, destination=None, on_change=None, store=None):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.window = window
+        self.account = account
+        self.destination = destination
+        self.on_change = on_change
+        self.store = store if store is not None else (TuneStore() if account is not None else None)
+
+        saved = self.store.get(account, destination, name) if self.store else None
+        self.value = self._clamp(saved if saved is not None else initial)
+        self.direction = 1
+        self.best_value = None
+        self.best_rate = None
+        self.base_latency = None
+        self.misses = 0
+        self.hold = 0
+        self._reset_window()
+
+    def _clamp(self, value):
+        return max(self.minimum, min(self.maximum, int(value)))
+
+    def _reset_window(self):
+        self._start = time.monotonic()
+        self._units = 0.0
+        self._latency_sum = 0.0
+        self._samples = 0
+
+    def _set(self, value):
+        value = self._clamp(value)
+        if value != self.value:
+            self.value = value
+            if self.on_change:
+                self.on_change(value)
+        self._reset_window()
+
+    @contextlib.contextmanager
+    def bind(self, apply):
+        """
+        Drive `apply(value)` (e.g. AdjustableLimiter.set_limit) from the knob inside a with-block
+
+        The current value is applied at once. The previous on_change still runs, and it is
+        restored on exit, so a tuner reused across runs does not keep resizing old limiters.
+        """
+        changed = self.on_change
+
+        def on_change(value):
+            apply(value)
+            if changed:
+                changed(value)
+
+        self.on_change = on_change
+        apply(self.value)
+        try:
+            yield self
+        finally:
+            self.on_change = changed
+
+    def record(self, units, latency=None):
+        """Report finished work (bytes, messages, ...) and optionally how long it took"""
+        self._units += units
+        if latency is not None:
+            self._latency_sum += latency
+            self._samples += 1
+        elapsed = time.monotonic() - self._start
+        if elapsed >= self.window:
+            latency_avg = self._latency_sum / self._samples if self._samples else None
+            self._evaluate(self._units / elapsed, latency_avg)
+
+    def flood(self, seconds=0):
+        """Back off after a FloodWait: halve the knob and measure again from there"""
+        self.best_value = None
+        self.best_rate = None
+        self.direction = -1
+        self.hold = self.hold_windows
+        self._set(max(self.minimum, self.value // 2))
+
+    def _evaluate(self, rate, latency):
+        value = self.value
+        if self.best_value is None or value == self.best_value:
+            # (Re)measure the current best, conditions drift during a run
+            self.best_value, self.best_rate = value, rate
+            if latency is not None and self.base_latency is None:
+                self.base_latency = latency
+        elif rate > self.best_rate * (1 + self.threshold):
+            self.best_value, self.best_rate = value, rate
+            self.misses = 0
+        else:
+            # No better than before: go back and try the other direction
+            self.misses += 1
+            self.direction = -self.direction
+            if self.misses >= 2:
+                self.hold = self.hold_windows
+                self.misses = 0
+            self._set(self.best_value)
+            return
+
+        if self.hold > 0:
+            self.hold -= 1
+            self._reset_window()
+            return
+
+        if latency is not None and self.base_latency and latency > self.base_latency * self.latency_factor:
+            self.direction = -1
+
+        target = self._clamp(value + self.direction * self.step)
+        if target == value:
+            self.direction = -self.direction
+            target = self._clamp(value + self.direction * self.step)
+        self._set(target)
+
+    def finish(self):
+        """Save the best value seen for the next run; returns it"""
+        best = self.best_value if self.best_value is not None else self.value
+        if self.store is not None and self.account is not None:
+            self.store.put(self.account, self.destination, self.name, best, self.best_rate)
+        return best
+
+
+async def account_key(client):
+    """Stable account identifier for saved settings (the logged-in user's ID)"""
+    me = await client.get_me(input_peer=True)
+    return str(getattr(me, 'user_id', None) or getattr(me, 'id', 'unknown'))
@@ -3,6 +3,9 @@
 Download specific Telegram messages from different threads
 Thread 31: messages 62, 92
 Thread 10: messages 80, 90, 91
+
+To grab whole topics instead of hand-picked IDs, use topic_crawler.py:
+  python topic_crawler.py 3399205162 --topic 31 --topic 10 --links links.txt
 """
 
 import subprocess
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+export_stream.py
+Constant-memory reader/writer for tdl chat export JSON.
+
+`tdl chat export` writes a single JSON object of the form
+
+    {"id": <chat id>, "messages": [{"id": 411, "type": "message", "file": "...", ...}, ...]}
+
+For large ranges this file can be hundreds of MB, so instead of `json.load`
+this module walks the top-level object incrementally and yields one message
+at a time. Memory use is bounded by the read chunk size plus the largest
+single message record.
+
+Features:
+- `iter_messages(path)` yields message dicts one by one
+- `read_header(path, keys)` returns the top-level fields other than `messages`
+  (stopping early once the wanted keys are seen)
+- `write_export(path, chat_id, messages)` streams records back out in tdl's format
+- `filter_export` / `split_export` to prepare filtered or sharded downloads
+
+Usage examples:
+  python export_stream.py count export_12345_400_700.json
+  python export_stream.py filter export.json --out videos.json --ext .mp4 .mkv
+  python export_stream.py split export.json --shards 4
+  python export_stream.py bench --messages 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\r\n'
+
+_decoder = json.JSONDecoder()
+
+
+class ExportFormatError(ValueError):
+    pass
+
+
+class _Reader:
+    """Character buffer over a text file that only keeps unconsumed data."""
+
+    def __init__(self, fh, chunk_size):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.fh.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop everything already consumed so the buffer stays small
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ExportFormatError(f'expected {char!r} in tdl export, got {self.peek()!r}')
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more data as needed."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A bare number may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _walk(path, on_field, chunk_size=CHUNK_SIZE):
+    """Walk the top-level export object, yielding message records.
+
+    `on_field(key, value)` receives every top-level field except `messages`.
+    """
+    with open(path, 'r', encoding='utf-8') as fh:
+        r = _Reader(fh, chunk_size)
+        r.expect('{')
+        if r.peek() == '}':
+            return
+        while True:
+            key = r.value()
+            r.expect(':')
+            if key == 'messages':
+                r.expect('[')
+                if r.peek() == ']':
+                    r.pos += 1
+                else:
+                    while True:
+                        yield r.value()
+                        c = r.peek()
+                        r.pos += 1
+                        if c == ']':
+                            break
+                        if c != ',':
+                            raise ExportFormatError(f'unexpected {c!r} in messages array')
+            else:
+                on_field(key, r.value())
+            c = r.peek()
+            r.pos += 1
+            if c == '}':
+                return
+            if c != ',':
+                raise ExportFormatError(f'unexpected {c!r} in export object')
+
+
+def iter_messages(path, chunk_size=CHUNK_SIZE):
+    """Yield message records from a tdl export file one at a time."""
+    return _walk(path, lambda key, value: None, chunk_size)
+
+
+def read_header(path, keys=None):
+    """Return the top-level fields of an export (everything but `messages`).
+
+    With `keys`, stop reading as soon as all of them are seen. tdl writes `id`
+    before `messages`, so `read_header(path, ['id'])` stops at the first message
+    instead of walking the whole file.
+    """
+    header = {}
+    wanted = set(keys) if keys else None
+    walker = _walk(path, header.__setitem__)
+    try:
+        for _ in walker:
+            if wanted and wanted <= header.keys():
+                break
+    finally:
+        walker.close()
+    return header
+
+
+def write_export(path, chat_id, messages):
+    """Stream message records into a tdl-compatible export file.
+
+    Returns the number of messages written.
+    """
+    count = 0
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        fh.write('{"id":%s,"messages":[' % json.dumps(chat_id))
+        for msg in messages:
+            if count:
+                fh.write(',')
+            fh.write(json.dumps(msg, ensure_ascii=False, separators=(',', ':')))
+            count += 1
+        fh.write(']}')
+    os.replace(tmp, path)
+    return count
+
+
+def filter_export(src, dst, predicate):
+    """Write the messages of `src` for which `predicate(msg)` is true to `dst`."""
+    chat_id = read_header(src, ['id']).get('id')
+    return write_export(dst, chat_id, (m for m in iter_messages(src) if predicate(m)))
+
+
+def split_export(src, shards, out_dir=None):
+    """Split an export into `shards` files with round-robin message assignment.
+
+    Round-robin keeps each shard spread across the whole range, so parallel
+    tdl jobs see a similar mix of file sizes. Returns the list of shard paths.
+    """
+    src = Path(src)
+    out_dir = Path(out_dir) if out_dir else src.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+    chat_id = read_header(src, ['id']).get('id')
+
+    paths = [out_dir / f'{src.stem}_part{i + 1}of{shards}{src.suffix}' for i in range(shards)]
+    # Like write_export: shards only replace existing files once all are complete
+    tmps = [f'{p}.tmp' for p in paths]
+    handles = [open(t, 'w', encoding='utf-8') for t in tmps]
+    counts = [0] * shards
+    try:
+        for fh in handles:
+            fh.write('{"id":%s,"messages":[' % json.dumps(chat_id))
+        for i, msg in enumerate(iter_messages(src)):
+            n = i % shards
+            if counts[n]:
+                handles[n].write(',')
+            handles[n].write(json.dumps(msg, ensure_ascii=False, separators=(',', ':')))
+            counts[n] += 1
+        for fh in handles:
+            fh.write(']}')
+    finally:
+        for fh in handles:
+            fh.close()
+    for tmp, path in zip(tmps, paths):
+        os.replace(tmp, path)
+    return [str(p) for p in paths]
+
+
+def make_predicate(ext=None, min_id=None, max_id=None, with_file=False):
+    exts = tuple(e.lower() for e in ext) if ext else None
+
+    def predicate(msg):
+        mid = msg.get('id', 0)
+        if min_id is not None and mid < min_id:
+            return False
+        if max_id is not None and mid > max_id:
+            return False
+        name = msg.get('file') or ''
+        if with_file and not name:
+            return False
+        if exts and not name.lower().endswith(exts):
+            return False
+        return True
+
+    return predicate
+
+
+def synthetic_messages(count):
+    for i in range(1, count + 1):
+        yield {
+            'id': i,
+            'type': 'message',
+            'file': f'lecture_{i:07d}.mp4' if i % 3 else '',
+            'date': 1700000000 + i,
+            'text': f'Lecture {i} notes',
+        }
+
+
+def bench(count, keep=False):
+    """Compare streaming parse with `json.load` on a synthetic export."""
+    import tracemalloc
+
+    fd, path = tempfile.mkstemp(suffix='.json', prefix='export_bench_')
+    os.close(fd)
+    try:
+        t0 = time.perf_counter()
+        write_export(path, 1234567890, synthetic_messages(count))
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f'Wrote {count} messages ({size_mb:.1f} MB) in {time.perf_counter() - t0:.2f}s -> {path}')
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        n = sum(1 for _ in iter_messages(path))
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'stream:    {n} messages in {elapsed:.2f}s, peak {peak / (1024 * 1024):.2f} MB')
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as fh:
+            n = len(json.load(fh)['messages'])
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'json.load: {n} messages in {elapsed:.2f}s, peak {peak / (1024 * 1024):.2f} MB')
+    finally:
+        if not keep:
+            os.remove(path)
+
+
+def main():
+    p = argparse.ArgumentParser(description='Stream, filter and split tdl chat export JSON')
+    sub = p.add_subparsers(dest='cmd', required=True)
+
+    c = sub.add_parser('count', help='Count messages (and messages with files) in an export')
+    c.add_argument('export')
+
+    f = sub.add_parser('filter', help='Write a filtered export')
+    f.add_argument('export')
+    f.add_argument('--out', '-o', required=True, help='Output export file')
+    f.add_argument('--ext', nargs='+', help='Keep only files with these extensions (e.g. .mp4 .pdf)')
+    f.add_argument('--min-id', type=int, help='Lowest message ID to keep')
+    f.add_argument('--max-id', type=int, help='Highest message ID to keep')
+    f.add_argument('--with-file', action='store_true', help='Drop messages without a file')
+
+    s = sub.add_parser('split', help='Split an export into shards for parallel tdl jobs')
+    s.add_argument('export')
+    s.add_argument('--shards', '-n', type=int, required=True, help='Number of shard files')
+    s.add_argument('--out-dir', help='Directory for shard files (defaults to the export folder)')
+
+    b = sub.add_parser('bench', help='Benchmark streaming vs json.load on a synthetic export')
+    b.add_argument('--messages', type=int, default=1_000_000)
+    b.add_argument('--keep', action='store_true', help='Keep the generated export file')
+
+    args = p.parse_args()
+
+    if args.cmd == 'bench':
+        bench(args.messages, args.keep)
+        return
+
+    if not Path(args.export).exists():
+        print(f'Export file not found: {args.export}', file=sys.stderr)
+        sys.exit(2)
+
+    if args.cmd == 'count':
+        total = with_file = 0
+        for msg in iter_messages(args.export):
+            total += 1
+            if msg.get('file'):
+                with_file += 1
+        print(f'Messages: {total} (with files: {with_file})')
+    elif args.cmd == 'filter':
+        predicate = make_predicate(args.ext, args.min_id, args.max_id, args.with_file)
+        n = filter_export(args.export, args.out, predicate)
+        print(f'Wrote {n} messages to {args.out}')
+    elif args.cmd == 'split':
+        if args.shards < 1:
+            p.error('--shards must be at least 1')
+        for path in split_export(args.export, args.shards, args.out_dir):
+            print(path)
+
+
+if __name__ == '__main__':
+    main()
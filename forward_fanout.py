@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Fan-out Message Forwarder
+Forward one source message range to several destinations in a single pass
+
+Each source batch is fetched once and handed to every destination at the same
+time. Every destination has its own bounded queue and worker, so a FloodWait or
+slow link on one group only slows that group down. Destinations can be chat IDs
+or invite links (joined the same way as forward_invite.py).
+
+The work is done by smart_downloader.forwarding.forward_fanout; this script
+resolves the chats and prints progress.
+"""
+import asyncio
+
+import tracing
+from retry_engine import describe_error
+from smart_downloader import client_context, forward_fanout, parse_date, resolve_date_range, resolve_entity
+from smart_downloader.forwarding import MAX_FORWARD_BATCH
+
+# Import configuration
+try:
+    from config import API_ID, API_HASH
+    SESSION_NAME = 'video_uploader'  # Use existing authenticated session
+except ImportError:
+    print("❌ ERROR: config.py not found!")
+    print("Please create config.py with your API credentials")
+    exit(1)
+
+def label(entity):
+    return getattr(entity, 'title', None) or str(getattr(entity, 'id', entity))
+
+def print_outcome(dest_entity, outcome):
+    """Print messages that finally failed for one destination"""
+    if outcome.status == 'failed':
+        print(f"❌ {label(dest_entity)}: Message {outcome.item} failed - {describe_error(outcome)}")
+
+def print_batch(dest_entity, msg_ids):
+    print(f"✅ {label(dest_entity)}: Forwarded {msg_ids[0]}-{msg_ids[-1]} ({len(msg_ids)} messages)")
+
+def print_retry(item, attempt, error_class, error, delay):
+    print(f"🔁 {item}: {error_class} error on attempt {attempt}, retrying in {delay:.1f}s")
+
+async def fanout(source_chat_id, destinations, start_msg_id, end_msg_id, batch_size=MAX_FORWARD_BATCH):
+    """
+    Forward a message range to several destinations, fetching each source batch once
+
+    Args:
+        source_chat_id: Source chat ID (can be negative for groups/channels)
+        destinations: List of destination chat IDs, usernames or invite links
+        start_msg_id: Starting message ID (or date, e.g. '2026-09-01')
+        end_msg_id: Ending message ID (or date; the whole day is included)
+        batch_size: Messages fetched and forwarded per request (max 100)
+
+    Returns:
+        List of ForwardResult, one per destination
+    """
+    by_date = isinstance(start_msg_id, str)
+    async with client_context(session=SESSION_NAME, api_id=API_ID, api_hash=API_HASH) as client:
+        print(f"\n{'='*60}")
+        print(f"📨 Fan-out Forwarding")
+        print(f"{'='*60}")
+        print(f"📤 From: {source_chat_id}")
+        print(f"📥 To: {len(destinations)} destinations")
+        if by_date:
+            print(f"📅 Date range: {start_msg_id} to {end_msg_id}")
+        else:
+            print(f"📊 Message range: {start_msg_id} to {end_msg_id}")
+        print(f"{'='*60}\n")
+
+        try:
+            source_entity = await resolve_entity(client, source_chat_id)
+            print(f"✅ Source chat verified: {getattr(source_entity, 'title', source_chat_id)}")
+
+            dest_entities = []
+            for dest in destinations:
+                entity = await resolve_entity(client, dest)
+                print(f"✅ Destination verified: {getattr(entity, 'title', None) or dest}")
+                dest_entities.append(entity)
+            print()
+        except Exception as e:
+            print(f"❌ Error getting chat entities: {e}")
+            return []
+
+        if by_date:
+            # Bounds are looked up once (offset_date / bisection) and cached in date_bounds.json
+            try:
+                start_msg_id, end_msg_id = await resolve_date_range(client, source_entity, start_msg_id, end_msg_id)
+            except ValueError as e:
+                print(f"❌ Error: {e}")
+                return []
+            if start_msg_id > end_msg_id:
+                print(f"⊘ No messages in this date range\n")
+                return []
+            print(f"📊 Message range: {start_msg_id} to {end_msg_id}\n")
+
+        results = await forward_fanout(source_entity, dest_entities, start_msg_id, end_msg_id,
+                                       batch_size=batch_size, on_outcome=print_outcome,
+                                       on_retry=print_retry, on_batch=print_batch, client=client)
+
+        # Summary per destination
+        print(f"\n{'='*60}")
+        print(f"📊 Fan-out Summary")
+        print(f"{'='*60}")
+        for result in results:
+            counts = result.counts()
+            print(f"📥 {label(result.destination)}")
+            print(f"   ✅ Successful: {counts['ok']}  ❌ Failed: {counts['failed']}  ⊘ Skipped: {counts['skipped']}")
+        print(f"{'='*60}\n")
+        return results
+
+if __name__ == '__main__':
+    import sys
+
+    sys.argv = tracing.setup_from_argv(sys.argv)
+
+    if len(sys.argv) < 5:
+        print("Usage:")
+        print("  python forward_fanout.py <source_chat_id> <start_msg_id> <end_msg_id> <dest> [<dest> ...]")
+        print("  python forward_fanout.py <source_chat_id> <start_date> <end_date> <dest> [<dest> ...]")
+        print("\nExample:")
+        print('  python forward_fanout.py -1003159701355 51 56 -1003305131927 "https://t.me/+YEZw2KYgHf9lNGJl"')
+        print('  python forward_fanout.py -1003159701355 2026-09-01 2026-09-30 -1003305131927')
+        print("\nNote:")
+        print("  - Dates (YYYY-MM-DD) select every message from the start day to the end of the end day")
+        print("  - Destinations can be chat IDs (-100<channel_id>) or invite links")
+        print("  - Each source batch is fetched once and forwarded to all destinations in parallel")
+        print("  - Add --trace <file.json> / --profile <file.prof> to record timings")
+        sys.exit(1)
+
+    try:
+        source = int(sys.argv[1])
+    except ValueError:
+        print("❌ Error: Source chat ID must be a number")
+        sys.exit(1)
+
+    # Two dates are kept as text and resolved to message IDs once connected
+    start, end = sys.argv[2], sys.argv[3]
+    if not (parse_date(start) and parse_date(end)):
+        try:
+            start, end = int(start), int(end)
+        except ValueError:
+            print("❌ Error: Use two message IDs or two dates (YYYY-MM-DD)")
+            sys.exit(1)
+
+    destinations = []
+    for dest in sys.argv[4:]:
+        try:
+            destinations.append(int(dest))
+        except ValueError:
+            destinations.append(dest)  # Invite link or username
+
+    asyncio.run(fanout(source, destinations, start, end))
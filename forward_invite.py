@@ -3,7 +3,11 @@
 Forward messages using invite link for destination
 """
 import asyncio
-from telethon import TelegramClient
+
+import tracing
+from forward_report import print_outcome, print_retry, print_summary
+from smart_downloader import client_context, forward_range, parse_date, resolve_date_range
+from smart_downloader import join_invite as join_invite_link
 
 # Import configuration
 try:
@@ -13,112 +17,94 @@ except ImportError:
     print("❌ ERROR: config.py not found!")
     exit(1)
 
+async def join_invite(client, invite_link):
+    """
+    Join a group by invite link (or look it up if already a member)
+    
+    Returns:
+        The destination chat entity
+    """
+    print(f"🔗 Processing invite link...")
+    
+    dest_entity, joined = await join_invite_link(client, invite_link)
+    if joined:
+        print(f"✅ Joined group: {dest_entity.title}")
+    else:
+        print(f"✅ Already a member or request sent")
+    return dest_entity
+
 async def forward_to_invite_link(source_chat_id, dest_invite_link, start_msg_id, end_msg_id):
     """
     Forward messages to a group using its invite link
+
+    Args:
+        start_msg_id: Starting message ID (or date, e.g. '2026-09-01')
+        end_msg_id: Ending message ID (or date; the whole day is included)
     """
-    async with TelegramClient(SESSION_NAME, API_ID, API_HASH) as client:
+    by_date = isinstance(start_msg_id, str)
+    async with client_context(session=SESSION_NAME, api_id=API_ID, api_hash=API_HASH) as client:
         print(f"\n{'='*60}")
         print(f"📨 Forwarding Messages via Invite Link")
         print(f"{'='*60}")
         
         try:
             # Join the destination group using invite link
-            print(f"🔗 Processing invite link...")
-            
-            # Extract hash from invite link
-            invite_hash = dest_invite_link.split('/')[-1].replace('+', '')
-            
-            # Join the chat
-            try:
-                updates = await client(functions.messages.ImportChatInviteRequest(invite_hash))
-                dest_entity = updates.chats[0]
-                print(f"✅ Joined group: {dest_entity.title}")
-            except Exception as e:
-                # Already a member, get the entity
-                if "already a participant" in str(e).lower() or "INVITE_REQUEST_SENT" in str(e):
-                    print(f"✅ Already a member or request sent")
-                    # Try to get entity by hash
-                    dest_entity = await client.get_entity(dest_invite_link)
-                else:
-                    raise e
+            dest_entity = await join_invite(client, dest_invite_link)
             
             # Get source entity
-            source_entity = await client.get_entity(-1000000000000 - source_chat_id)
+            with tracing.span('get_entity'):
+                source_entity = await client.get_entity(-1000000000000 - source_chat_id)
             
             print(f"📤 From: {getattr(source_entity, 'title', source_chat_id)}")
             print(f"📥 To: {getattr(dest_entity, 'title', 'Group')}")
+            if by_date:
+                print(f"📅 Date range: {start_msg_id} to {end_msg_id}")
+                # Bounds are looked up once (offset_date / bisection) and cached in date_bounds.json
+                start_msg_id, end_msg_id = await resolve_date_range(client, source_entity, start_msg_id, end_msg_id)
+                if start_msg_id > end_msg_id:
+                    print(f"⊘ No messages in this date range\n")
+                    return
             print(f"📊 Message range: {start_msg_id} to {end_msg_id}")
             print(f"📝 Total messages: {end_msg_id - start_msg_id + 1}")
             print(f"{'='*60}\n")
             
-            # Forward messages one by one
-            successful = 0
-            failed = 0
-            skipped = 0
-            
-            for msg_id in range(start_msg_id, end_msg_id + 1):
-                try:
-                    message = await client.get_messages(source_entity, ids=msg_id)
-                    
-                    if message is None:
-                        print(f"⊘ Message {msg_id}: Skipped (deleted or not found)")
-                        skipped += 1
-                        continue
-                    
-                    # Forward the message
-                    await client.forward_messages(
-                        entity=dest_entity,
-                        messages=msg_id,
-                        from_peer=source_entity
-                    )
-                    
-                    print(f"✅ Message {msg_id}: Forwarded successfully")
-                    successful += 1
-                    
-                    # Small delay to avoid rate limiting
-                    await asyncio.sleep(0.5)
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    if "protected" in error_msg.lower():
-                        print(f"❌ Message {msg_id}: Failed - Source chat has forwarding protection")
-                    else:
-                        print(f"❌ Message {msg_id}: Failed - {error_msg[:50]}")
-                    failed += 1
-                    continue
-            
-            # Summary
-            print(f"\n{'='*60}")
-            print(f"📊 Forwarding Summary")
-            print(f"{'='*60}")
-            print(f"✅ Successful: {successful}")
-            print(f"❌ Failed: {failed}")
-            print(f"⊘ Skipped: {skipped}")
-            print(f"📝 Total: {successful + failed + skipped}")
-            print(f"{'='*60}\n")
+            # Forward messages one by one; transient failures are retried later
+            result = await forward_range(source_entity, dest_entity, start_msg_id, end_msg_id,
+                                         on_outcome=print_outcome, on_retry=print_retry, client=client)
+            print_summary(result)
             
         except Exception as e:
             print(f"❌ Error: {e}\n")
 
 if __name__ == '__main__':
     import sys
-    from telethon.tl import functions
+    
+    sys.argv = tracing.setup_from_argv(sys.argv)
     
     if len(sys.argv) < 5:
         print("Usage:")
         print("  python forward_invite.py <source_chat_id> <dest_invite_link> <start_msg_id> <end_msg_id>")
+        print("  python forward_invite.py <source_chat_id> <dest_invite_link> <start_date> <end_date>")
         print("\nExample:")
         print('  python forward_invite.py 2732989224 "https://t.me/+YEZw2KYgHf9lNGJl" 2 32')
+        print('  python forward_invite.py 2732989224 "https://t.me/+YEZw2KYgHf9lNGJl" 2026-09-01 2026-09-30')
+        print("\nAdd --trace <file.json> / --profile <file.prof> to record timings")
         sys.exit(1)
     
     try:
         source = int(sys.argv[1])
-        dest_link = sys.argv[2]
-        start = int(sys.argv[3])
-        end = int(sys.argv[4])
     except ValueError:
-        print("❌ Error: Source chat ID and message IDs must be numbers")
+        print("❌ Error: Source chat ID must be a number")
         sys.exit(1)
+    dest_link = sys.argv[2]
+    
+    # Two dates are kept as text and resolved to message IDs once connected
+    start, end = sys.argv[3], sys.argv[4]
+    if not (parse_date(start) and parse_date(end)):
+        try:
+            start, end = int(start), int(end)
+        except ValueError:
+            print("❌ Error: Use two message IDs or two dates (YYYY-MM-DD)")
+            sys.exit(1)
     
     asyncio.run(forward_to_invite_link(source, dest_link, start, end))
@@ -4,8 +4,12 @@ Telegram Message Forwarder
 Forward messages from one group/chat to another
 """
 import asyncio
-from telethon import TelegramClient
-from telethon.tl.types import InputMessagesFilterEmpty
+
+import tracing
+from autotune import AutoTuner, account_key
+from forward_report import print_outcome, print_retry, print_summary
+from smart_downloader import client_context, forward_range, parse_date, resolve_date_range
+from smart_downloader.forwarding import MAX_FORWARD_BATCH
 
 # Import configuration
 try:
@@ -21,78 +25,74 @@ if not API_ID or not API_HASH:
     print("Edit config.py and add your credentials from https://my.telegram.org/apps")
     exit(1)
 
-async def forward_messages(source_chat_id, dest_chat_id, start_msg_id, end_msg_id):
+async def forward_messages(source_chat_id, dest_chat_id, start_msg_id, end_msg_id, auto=False):
     """
     Forward messages from source chat to destination chat
     
     Args:
         source_chat_id: Source chat ID (can be negative for groups/channels)
         dest_chat_id: Destination chat ID
-        start_msg_id: Starting message ID
-        end_msg_id: Ending message ID
+        start_msg_id: Starting message ID (or date, e.g. '2026-09-01')
+        end_msg_id: Ending message ID (or date; the whole day is included)
+        auto: Forward in batches, auto-tuning the batch size on measured messages/s
     """
-    async with TelegramClient(SESSION_NAME, API_ID, API_HASH) as client:
+    by_date = isinstance(start_msg_id, str)
+    async with client_context(session=SESSION_NAME, api_id=API_ID, api_hash=API_HASH) as client:
         print(f"\n{'='*60}")
         print(f"📨 Forwarding Messages")
         print(f"{'='*60}")
         print(f"📤 From: {source_chat_id}")
         print(f"📥 To: {dest_chat_id}")
-        print(f"📊 Message range: {start_msg_id} to {end_msg_id}")
-        print(f"📝 Total messages: {end_msg_id - start_msg_id + 1}")
+        if by_date:
+            print(f"📅 Date range: {start_msg_id} to {end_msg_id}")
+        else:
+            print(f"📊 Message range: {start_msg_id} to {end_msg_id}")
+            print(f"📝 Total messages: {end_msg_id - start_msg_id + 1}")
         print(f"{'='*60}\n")
         
         # Get the source and destination entities
         try:
-            source_entity = await client.get_entity(source_chat_id)
-            dest_entity = await client.get_entity(dest_chat_id)
+            with tracing.span('get_entity'):
+                source_entity = await client.get_entity(source_chat_id)
+                dest_entity = await client.get_entity(dest_chat_id)
             print(f"✅ Source chat verified: {getattr(source_entity, 'title', source_chat_id)}")
             print(f"✅ Destination chat verified: {getattr(dest_entity, 'title', dest_chat_id)}\n")
         except Exception as e:
             print(f"❌ Error getting chat entities: {e}")
             return
         
-        # Forward messages
-        successful = 0
-        failed = 0
-        skipped = 0
-        
-        for msg_id in range(start_msg_id, end_msg_id + 1):
+        if by_date:
+            # Bounds are looked up once (offset_date / bisection) and cached in date_bounds.json
             try:
-                # Get the message
-                message = await client.get_messages(source_entity, ids=msg_id)
-                
-                if message is None:
-                    print(f"⊘ Message {msg_id}: Skipped (deleted or not found)")
-                    skipped += 1
-                    continue
-                
-                # Forward the message
-                await client.forward_messages(
-                    entity=dest_entity,
-                    messages=msg_id,
-                    from_peer=source_entity
-                )
-                
-                print(f"✅ Message {msg_id}: Forwarded successfully")
-                successful += 1
-                
-                # Small delay to avoid rate limiting
-                await asyncio.sleep(0.5)
-                
-            except Exception as e:
-                print(f"❌ Message {msg_id}: Failed - {str(e)[:50]}")
-                failed += 1
-                continue
+                start_msg_id, end_msg_id = await resolve_date_range(client, source_entity, start_msg_id, end_msg_id)
+            except ValueError as e:
+                print(f"❌ Error: {e}")
+                return
+            if start_msg_id > end_msg_id:
+                print(f"⊘ No messages in this date range\n")
+                return
+            print(f"📊 Message range: {start_msg_id} to {end_msg_id}")
+            print(f"📝 Total messages: {end_msg_id - start_msg_id + 1}\n")
         
-        # Summary
-        print(f"\n{'='*60}")
-        print(f"📊 Forwarding Summary")
-        print(f"{'='*60}")
-        print(f"✅ Successful: {successful}")
-        print(f"❌ Failed: {failed}")
-        print(f"⊘ Skipped: {skipped}")
-        print(f"📝 Total: {successful + failed + skipped}")
-        print(f"{'='*60}\n")
+        tuner = None
+        if auto:
+            def on_change(size):
+                print(f"⚙️  Auto-tune: batch size {size}")
+            
+            tuner = AutoTuner('forward_batch', 10, 1, MAX_FORWARD_BATCH, step=10, window=15.0,
+                              account=await account_key(client), destination=str(dest_chat_id),
+                              on_change=on_change)
+            print(f"⚙️  Auto-tune: starting with batch size {tuner.value}\n")
+        
+        # One by one (transient failures are retried from a deferred queue) or auto-tuned batches
+        result = await forward_range(source_entity, dest_entity, start_msg_id, end_msg_id,
+                                     mode='batched' if auto else 'each', tuner=tuner,
+                                     on_outcome=print_outcome, on_retry=print_retry, client=client)
+        
+        if tuner:
+            print(f"\n⚙️  Auto-tune: saved batch size {tuner.finish()} for next time")
+        
+        print_summary(result)
 
 async def forward_messages_bulk(source_chat_id, dest_chat_id, start_msg_id, end_msg_id):
     """
@@ -101,69 +101,80 @@ async def forward_messages_bulk(source_chat_id, dest_chat_id, start_msg_id, end_
     Args:
         source_chat_id: Source chat ID
         dest_chat_id: Destination chat ID
-        start_msg_id: Starting message ID
-        end_msg_id: Ending message ID
+        start_msg_id: Starting message ID (or date)
+        end_msg_id: Ending message ID (or date)
     """
-    async with TelegramClient(SESSION_NAME, API_ID, API_HASH) as client:
-        print(f"\n{'='*60}")
-        print(f"📨 Bulk Forwarding Messages")
-        print(f"{'='*60}")
-        print(f"📤 From: {source_chat_id}")
-        print(f"📥 To: {dest_chat_id}")
-        print(f"📊 Message range: {start_msg_id} to {end_msg_id}")
-        print(f"{'='*60}\n")
+    by_date = isinstance(start_msg_id, str)
+    print(f"\n{'='*60}")
+    print(f"📨 Bulk Forwarding Messages")
+    print(f"{'='*60}")
+    print(f"📤 From: {source_chat_id}")
+    print(f"📥 To: {dest_chat_id}")
+    print(f"{'📅 Date' if by_date else '📊 Message'} range: {start_msg_id} to {end_msg_id}")
+    print(f"{'='*60}\n")
+    
+    try:
+        if by_date:
+            print(f"🚀 Forwarding messages in bulk...")
+        else:
+            print(f"🚀 Forwarding {end_msg_id - start_msg_id + 1} messages in bulk...")
         
-        try:
-            source_entity = await client.get_entity(source_chat_id)
-            dest_entity = await client.get_entity(dest_chat_id)
-            
-            # Create list of message IDs
-            message_ids = list(range(start_msg_id, end_msg_id + 1))
-            
-            print(f"🚀 Forwarding {len(message_ids)} messages in bulk...")
-            
-            # Forward all messages at once
-            await client.forward_messages(
-                entity=dest_entity,
-                messages=message_ids,
-                from_peer=source_entity
-            )
-            
-            print(f"✅ Bulk forward completed!")
-            print(f"📝 Note: Some messages may have been skipped if deleted/empty\n")
-            
-        except Exception as e:
-            print(f"❌ Error during bulk forward: {e}\n")
+        # Forward without fetching first (100 IDs per request)
+        result = await forward_range(source_chat_id, dest_chat_id, start_msg_id, end_msg_id, mode='bulk',
+                                     session=SESSION_NAME, api_id=API_ID, api_hash=API_HASH)
+        
+        print(f"✅ Bulk forward completed!")
+        print(f"📝 {len(result.succeeded)} forwarded, {len(result.skipped)} skipped (deleted/empty)\n")
+        
+    except Exception as e:
+        print(f"❌ Error during bulk forward: {e}\n")
 
 if __name__ == '__main__':
     import sys
     
+    sys.argv = tracing.setup_from_argv(sys.argv)
+    
     if len(sys.argv) < 5:
         print("Usage:")
         print("  Individual: python forward_messages.py <source_chat_id> <dest_chat_id> <start_msg_id> <end_msg_id>")
         print("  Bulk:       python forward_messages.py <source_chat_id> <dest_chat_id> <start_msg_id> <end_msg_id> --bulk")
+        print("  Auto-tuned: python forward_messages.py <source_chat_id> <dest_chat_id> <start_msg_id> <end_msg_id> --auto")
+        print("  By date:    python forward_messages.py <source_chat_id> <dest_chat_id> <start_date> <end_date>")
         print("\nExample:")
         print('  python forward_messages.py -1003159701355 -1003305131927 51 56')
         print('  python forward_messages.py -1003159701355 -1003305131927 51 56 --bulk')
+        print('  python forward_messages.py -1003159701355 -1003305131927 2026-09-01 2026-09-30')
         print("\nNote:")
         print("  - For private groups/channels, use negative chat IDs: -100<channel_id>")
+        print("  - Dates are YYYY-MM-DD (whole days, local time) or \"YYYY-MM-DD HH:MM\"")
         print("  - Individual mode: Forwards one by one with detailed feedback")
         print("  - Bulk mode: Faster but less detailed feedback")
+        print("  - Auto mode: Batched forwarding with batch size tuned on messages/s (saved per destination)")
+        print("  - Several destinations at once: use forward_fanout.py")
+        print("  - Add --trace <file.json> / --profile <file.prof> to record timings")
         sys.exit(1)
     
     try:
         source = int(sys.argv[1])
         dest = int(sys.argv[2])
-        start = int(sys.argv[3])
-        end = int(sys.argv[4])
     except ValueError:
-        print("❌ Error: Chat IDs and message IDs must be numbers")
+        print("❌ Error: Chat IDs must be numbers")
         sys.exit(1)
     
+    # Two dates are kept as text and resolved to message IDs once connected
+    start, end = sys.argv[3], sys.argv[4]
+    if not (parse_date(start) and parse_date(end)):
+        try:
+            start, end = int(start), int(end)
+        except ValueError:
+            print("❌ Error: Use two message IDs or two dates (YYYY-MM-DD)")
+            sys.exit(1)
+    
     # Check if bulk mode
-    bulk_mode = len(sys.argv) > 5 and sys.argv[5] == '--bulk'
+    flags = sys.argv[5:]
+    bulk_mode = '--bulk' in flags
     
     if bulk_mode:
         asyncio.run(forward_messages_bulk(source, dest, start, end))
     else:
-        asyncio.run(forward_messages(source, dest, start, end))
+        asyncio.run(forward_messages(source, dest, start, end, auto='--auto' in flags))
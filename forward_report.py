@@ -0,0 +1,37 @@
+"""
+Console reporters shared by the forwarding scripts
+Pass them as on_outcome / on_retry to smart_downloader.forward_range
+"""
+from retry_engine import describe_error
+
+
+def print_outcome(outcome):
+    """Print the final result of one message"""
+    msg_id = outcome.item
+    if outcome.status == 'ok':
+        retried = f" (after {outcome.attempts} attempts)" if outcome.attempts > 1 else ""
+        print(f"✅ Message {msg_id}: Forwarded successfully{retried}")
+    elif outcome.status == 'skipped':
+        print(f"⊘ Message {msg_id}: Skipped (deleted or not found)")
+    else:
+        print(f"❌ Message {msg_id}: Failed - {describe_error(outcome)}")
+
+
+def print_retry(msg_id, attempt, error_class, error, delay):
+    """Print a notice before a message is retried"""
+    print(f"🔁 Message {msg_id}: {error_class} error on attempt {attempt}, retrying in {delay:.1f}s")
+
+
+def print_summary(result):
+    """Print the summary block for a ForwardResult"""
+    counts = result.counts()
+    successful, failed, skipped = counts['ok'], counts['failed'], counts['skipped']
+    
+    print(f"\n{'='*60}")
+    print(f"📊 Forwarding Summary")
+    print(f"{'='*60}")
+    print(f"✅ Successful: {successful}")
+    print(f"❌ Failed: {failed}")
+    print(f"⊘ Skipped: {skipped}")
+    print(f"📝 Total: {successful + failed + skipped}")
+    print(f"{'='*60}\n")
@@ -1,21 +1,67 @@
 import os
-import subprocess
 import sys
 import re
+from datetime import datetime, timedelta
+
+import tracing
+from tdl_runner import TdlJob, print_event, run_jobs
 
 # Configuration
 TDL_PATH = r".\tdl\bin\tdl.exe"
+BACKEND = 'tdl'  # or 'native': download with Telethon (needs config.py), no tdl.exe required
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
-def run_command(command):
+def run_command(args):
+    """Runs tdl with the given argument list, showing its own progress output."""
+    print(f"\nRunning: {TDL_PATH} {' '.join(args)}")
     try:
-        subprocess.run(command, check=True, shell=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing command: {e}")
+        # tdl's progress bars already say what is happening; parsed events would interleave with them
+        result = run_jobs(TDL_PATH, [TdlJob(args, name=args[0])], max_concurrency=1, echo=True)[0]
+    except KeyboardInterrupt:
+        print("\nCommand cancelled.")
+        return False
+    if not result.ok:
+        print(f"Error executing command: tdl exited with code {result.returncode}")
         return False
+    return True
+
+def run_native(folder, link=None, chat_id=None, range_type='id', start=None, end=None):
+    """Downloads a link or a message range with the built-in Telethon engine instead of tdl."""
+    import asyncio
+    from smart_downloader import client_context, download_links, download_messages, resolve_date_range
+    from smart_downloader.links import to_peer_id
+
+    async def download():
+        if link:
+            return await download_links([link], folder, backend='native', on_event=print_event)
+        async with client_context() as client:
+            peer = to_peer_id(int(chat_id))
+            if range_type == 'time':
+                with tracing.span('resolve dates'):
+                    first, last = await resolve_date_range(client, await client.get_entity(peer),
+                                                           datetime.fromtimestamp(int(start)), datetime.fromtimestamp(int(end)))
+                print(f"Dates resolved to messages {first}-{last}")
+            else:
+                first, last = int(start), int(end)
+            items = [(peer, msg_id) for msg_id in range(first, last + 1)]
+            return await download_messages(items, folder, on_event=print_event, client=client)
+
+    print(f"\nDownloading with the native engine into {folder}...")
+    try:
+        result = asyncio.run(download())
+    except KeyboardInterrupt:
+        print("\nDownload cancelled. Run it again to resume.")
+        return False
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+    counts = result.counts()
+    print(f"\nDone: {counts['ok']} downloaded, {counts['skipped']} without files, {counts['failed']} failed")
+    for item in result.failed:
+        print(f"  Failed: {item.item} - {item.error}")
+    return result.ok
 
 def list_directories():
     """Returns a list of directories in the current folder."""
@@ -98,6 +144,17 @@ def extract_message_id(input_str):
         
     return input_str
 
+def parse_date_input(input_str, end=False):
+    """Returns the unix time of a YYYY-MM-DD date (local time), or None if it is not a date."""
+    try:
+        day = datetime.strptime(input_str, '%Y-%m-%d')
+    except ValueError:
+        return None
+    if end:
+        # An end date includes the whole day
+        return int((day + timedelta(days=1)).timestamp()) - 1
+    return int(day.timestamp())
+
 def download_via_link():
     print("\n--- Download via Link ---")
     link = input("Enter Telegram Message Link: ").strip()
@@ -107,14 +164,16 @@ def download_via_link():
 
     folder = select_folder()
     
-    cmd = f'"{TDL_PATH}" dl -u {link} -d "{folder}"'
-    print(f"\nRunning: {cmd}")
-    run_command(cmd)
+    if BACKEND == 'native':
+        run_native(folder, link=link)
+    else:
+        run_command(['dl', '-u', link, '-d', folder])
     input("\nPress Enter to return to menu...")
 
 def download_via_range():
     print("\n--- Download via Range ---")
     print("Tip: You can paste the Chat ID or a full link like https://t.me/c/12345/100")
+    print("Tip: Start/End can also be dates like 2026-09-01 and 2026-09-30")
     
     chat_input = input("Enter Chat ID: ").strip()
     chat_id = extract_chat_id(chat_input)
@@ -123,30 +182,49 @@ def download_via_range():
         print("Chat ID is required.")
         return
 
-    start_input = input("Enter Start Message ID (or link): ").strip()
-    start_id = extract_message_id(start_input)
+    start_input = input("Enter Start Message ID (or link, or date): ").strip()
+    end_input = input("Enter End Message ID (or link, or date): ").strip()
     
-    end_input = input("Enter End Message ID (or link): ").strip()
-    end_id = extract_message_id(end_input)
+    # Dates are exported by time; tdl looks up the matching messages itself
+    start_time = parse_date_input(start_input)
+    end_time = parse_date_input(end_input, end=True)
+    by_date = start_time is not None and end_time is not None
     
-    if not start_id or not end_id:
-        print("Start and End IDs are required.")
-        return
+    if by_date:
+        range_type, start_id, end_id = 'time', str(start_time), str(end_time)
+        print(f"Detected: ChatID={chat_id}, Dates={start_input} to {end_input}")
+    else:
+        range_type = 'id'
+        start_id = extract_message_id(start_input)
+        end_id = extract_message_id(end_input)
         
-    print(f"Detected: ChatID={chat_id}, Range={start_id}-{end_id}")
+        if not start_id or not end_id:
+            print("Start and End IDs are required.")
+            return
+            
+        print(f"Detected: ChatID={chat_id}, Range={start_id}-{end_id}")
 
     folder = select_folder()
 
+    if BACKEND == 'native':
+        # No export step: messages are fetched and downloaded directly
+        run_native(folder, chat_id=chat_id, range_type=range_type, start=start_id, end=end_id)
+        input("\nPress Enter to return to menu...")
+        return
+
     export_file = f"export_{chat_id}_{start_id}_{end_id}.json"
     
     print("\nStep 1: Exporting message list...")
     # Export command
-    export_cmd = f'"{TDL_PATH}" chat export -c {chat_id} -T id -i {start_id},{end_id} -o "{export_file}"'
-    if run_command(export_cmd):
+    export_cmd = ['chat', 'export', '-c', chat_id, '-T', range_type, '-i', f'{start_id},{end_id}', '-o', export_file]
+    with tracing.span('export'):
+        exported = run_command(export_cmd)
+    if exported:
         print("\nStep 2: Downloading files...")
         # Download command
-        dl_cmd = f'"{TDL_PATH}" dl -f "{export_file}" -d "{folder}"'
-        run_command(dl_cmd)
+        dl_cmd = ['dl', '-f', export_file, '-d', folder]
+        with tracing.span('download'):
+            run_command(dl_cmd)
         
         # Cleanup (Optional: keep export file or delete)
         if os.path.exists(export_file):
@@ -158,14 +236,14 @@ def download_via_range():
     input("\nPress Enter to return to menu...")
 
 def main():
-    global TDL_PATH
+    global TDL_PATH, BACKEND
     # Ensure TDL path is correct
     if not os.path.exists(TDL_PATH):
         # Fallback check for absolute path
         if os.path.exists(r"e:\telegram\tdl\bin\tdl.exe"):
              TDL_PATH = r"e:\telegram\tdl\bin\tdl.exe"
-        else:
-            print(f"Warning: tdl.exe not found at {TDL_PATH}")
+        elif BACKEND == 'tdl':
+            print(f"Warning: tdl.exe not found at {TDL_PATH} (menu option 3 switches to the native engine)")
 
     while True:
         clear_screen()
@@ -174,23 +252,33 @@ def main():
         print("   Made with ❤️  by Kumar Sonu from MIT   ")
         print("=========================================")
         print("1. Download Individually (via Link)")
-        print("2. Download Range (ChatID + Start/End)")
-        print("3. Exit")
+        print("2. Download Range (ChatID + Start/End IDs or dates)")
+        print(f"3. Switch Download Engine (current: {BACKEND})")
+        print("4. Exit")
         print("=========================================")
         
-        choice = input("Enter your choice (1-3): ").strip()
+        choice = input("Enter your choice (1-4): ").strip()
 
         if choice == '1':
             download_via_link()
         elif choice == '2':
             download_via_range()
         elif choice == '3':
+            BACKEND = 'native' if BACKEND == 'tdl' else 'tdl'
+        elif choice == '4':
             print("Exiting... Goodbye!")
             sys.exit(0)
         else:
             input("Invalid choice. Press Enter to try again...")
 
 if __name__ == "__main__":
+    # Optional: python interactive_tdl.py --trace trace.json --profile run.prof --backend native
+    argv = tracing.setup_from_argv(sys.argv)
+    if '--backend' in argv[1:-1]:
+        BACKEND = argv[argv.index('--backend') + 1]
+        if BACKEND not in ('tdl', 'native'):
+            print("--backend must be 'tdl' or 'native'")
+            sys.exit(2)
     try:
         main()
     except KeyboardInterrupt:
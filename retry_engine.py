@@ -0,0 +1,272 @@
+"""
+Retry engine for Telegram jobs
+Classifies Telethon errors and retries transient ones from a deferred queue
+
+Error classes:
+- transient:       network drops, timeouts, Telegram 5xx -> retried with jittered exponential backoff
+- flood:           FloodWait / slow mode -> whole pipeline pauses for the requested time, then retried
+- file_reference:  file reference expired -> optional refresh hook, then retried
+- permanent:       everything else (forwarding protection, invalid IDs, no rights) -> fails at once
+
+Failed items go to a deferred queue that is drained in the background, so the
+main pipeline keeps moving instead of waiting on one bad item. Retries run as
+their own tasks under the same limiter as the main pipeline.
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from telethon import errors
+
+import tracing
+from autotune import AdjustableLimiter
+
+TRANSIENT = 'transient'
+FLOOD = 'flood'
+FILE_REFERENCE = 'file_reference'
+PERMANENT = 'permanent'
+
+
+def _error_types(*names):
+    # Not every Telethon release ships every error class
+    return tuple(t for t in (getattr(errors, n, None) for n in names) if isinstance(t, type))
+
+
+FLOOD_ERRORS = _error_types('FloodWaitError', 'FloodPremiumWaitError', 'SlowModeWaitError', 'FloodTestPhoneWaitError')
+FILE_REFERENCE_ERRORS = _error_types('FileReferenceExpiredError', 'FileReferenceInvalidError')
+TRANSIENT_ERRORS = _error_types(
+    'ServerError', 'TimedOutError', 'RpcCallFailError', 'RpcMcgetFailError',
+    'WorkerBusyTooLongRetryError', 'InterdcCallErrorError', 'InterdcCallRichErrorError',
+) + (ConnectionError, TimeoutError, asyncio.TimeoutError)
+FORWARDS_RESTRICTED_ERRORS = _error_types('ChatForwardsRestrictedError')
+
+
+class SkipItem(Exception):
+    """Raised by a worker to mark an item as skipped (e.g. deleted message)"""
+
+
+def classify_error(exc):
+    """Return the error class (TRANSIENT, FLOOD, FILE_REFERENCE or PERMANENT) of an exception"""
+    if isinstance(exc, FLOOD_ERRORS):
+        return FLOOD
+    if isinstance(exc, FILE_REFERENCE_ERRORS):
+        return FILE_REFERENCE
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return TRANSIENT
+    if isinstance(exc, errors.RPCError) and 'FILE_REFERENCE' in str(exc).upper():
+        return FILE_REFERENCE
+    return PERMANENT
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5  # Total tries per item, including the first one
+    base_delay: float = 1.0  # Backoff for the first retry (seconds)
+    max_delay: float = 60.0  # Backoff ceiling (seconds)
+    max_flood_wait: float = 600.0  # Give up on FloodWaits longer than this (seconds)
+
+    def backoff(self, attempt):
+        """Jittered exponential backoff before retry number `attempt` (1-based)"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(delay / 2, delay)
+
+
+@dataclass
+class ItemOutcome:
+    item: Any
+    status: str = 'pending'  # 'ok', 'failed' or 'skipped'
+    attempts: int = 0
+    error_class: Optional[str] = None
+    error: Optional[BaseException] = None
+    result: Any = None
+    elapsed: float = 0.0
+
+
+class RetryEngine:
+    """
+    Run a worker over items with classified retries
+
+    Args:
+        worker: async callable `worker(item)` returning a result; raise SkipItem to skip
+        policy: RetryPolicy (defaults are used if omitted)
+        concurrency: Number of items processed at once by the main pipeline
+        limiter: Optional AdjustableLimiter to change concurrency during the run
+                 (up to max_concurrency workers are started)
+        on_outcome: Optional callback `on_outcome(ItemOutcome)` when an item is final
+        on_retry: Optional callback `on_retry(item, attempt, error_class, exc, delay)`
+        refresh: Optional async callable `refresh(item)` run before retrying a file-reference error
+    """
+
+    def __init__(self, worker, policy=None, concurrency=1, on_outcome=None, on_retry=None, refresh=None,
+                 limiter=None, max_concurrency=None):
+        self.worker = worker
+        self.policy = policy or RetryPolicy()
+        self.concurrency = max(1, int(concurrency))
+        self.limiter = limiter or AdjustableLimiter(self.concurrency)
+        self.max_concurrency = max(self.concurrency, int(max_concurrency or 0))
+        self.on_outcome = on_outcome
+        self.on_retry = on_retry
+        self.refresh = refresh
+        self._deferred = []
+        self._seq = itertools.count()
+        self._pause_until = 0.0
+        self._wakeup = None
+
+    async def _wait_for_flood(self):
+        while True:
+            delay = self._pause_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, outcome):
+        """Try an item once; return True if it is final, False if it was deferred"""
+        await self._wait_for_flood()
+        outcome.attempts += 1
+        start = time.monotonic()
+        try:
+            outcome.result = await self.worker(outcome.item)
+            outcome.status = 'ok'
+            outcome.error = None
+            outcome.error_class = None
+        except SkipItem:
+            outcome.status = 'skipped'
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcome.error = e
+            outcome.error_class = classify_error(e)
+            delay = self._retry_delay(outcome)
+            if delay is not None:
+                outcome.elapsed += time.monotonic() - start
+                tracing.instant('retry', item=str(outcome.item), attempt=outcome.attempts,
+                                error_class=outcome.error_class, delay=round(delay, 2))
+                if self.on_retry:
+                    self.on_retry(outcome.item, outcome.attempts, outcome.error_class, e, delay)
+                if outcome.error_class == FILE_REFERENCE and self.refresh:
+                    try:
+                        await self.refresh(outcome.item)
+                    except Exception:
+                        pass
+                self._defer(outcome, delay)
+                return False
+            outcome.status = 'failed'
+        outcome.elapsed += time.monotonic() - start
+        if self.on_outcome:
+            self.on_outcome(outcome)
+        return True
+
+    def _retry_delay(self, outcome):
+        """Seconds to wait before retrying, or None to fail the item now"""
+        cls = outcome.error_class
+        if cls == PERMANENT or outcome.attempts >= self.policy.max_attempts:
+            return None
+        if cls == FLOOD:
+            seconds = getattr(outcome.error, 'seconds', 0) or 0
+            if seconds > self.policy.max_flood_wait:
+                return None
+            # Everyone shares the account's flood limit, so pause the whole pipeline
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds + 1)
+            return seconds + 1
+        if cls == FILE_REFERENCE:
+            return 0.0
+        return self.policy.backoff(outcome.attempts)
+
+    def _defer(self, outcome, delay):
+        heapq.heappush(self._deferred, (time.monotonic() + delay, next(self._seq), outcome))
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _retry(self, outcome):
+        async with self.limiter:
+            await self._attempt(outcome)
+
+    async def _drain_deferred(self, main_done):
+        """Start deferred items as tasks as they come due until everything is final"""
+        running = set()
+        failures = []
+
+        def finished(task):
+            running.discard(task)
+            if not task.cancelled() and task.exception():
+                failures.append(task.exception())
+            self._wakeup.set()
+
+        try:
+            while True:
+                if failures:
+                    raise failures[0]
+                if not self._deferred:
+                    if main_done.is_set() and not running:
+                        return
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                due, _, outcome = self._deferred[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                heapq.heappop(self._deferred)
+                task = asyncio.ensure_future(self._retry(outcome))
+                running.add(task)
+                task.add_done_callback(finished)
+        finally:
+            for task in list(running):
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def run(self, items):
+        """Process all items and return their ItemOutcomes in input order"""
+        outcomes = [ItemOutcome(item) for item in items]
+        self._wakeup = asyncio.Event()
+        main_done = asyncio.Event()
+        queue = asyncio.Queue()
+        for outcome in outcomes:
+            queue.put_nowait(outcome)
+
+        async def main_worker():
+            while True:
+                async with self.limiter:
+                    try:
+                        outcome = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await self._attempt(outcome)
+
+        drainer = asyncio.ensure_future(self._drain_deferred(main_done))
+        try:
+            await asyncio.gather(*[main_worker() for _ in range(self.max_concurrency)])
+            main_done.set()
+            self._wakeup.set()
+            await drainer
+        finally:
+            if not drainer.done():
+                drainer.cancel()
+        return outcomes
+
+
+def summarize(outcomes):
+    """Count outcomes by status"""
+    counts = {'ok': 0, 'failed': 0, 'skipped': 0}
+    for outcome in outcomes:
+        counts[outcome.status] = counts.get(outcome.status, 0) + 1
+    return counts
+
+
+def describe_error(outcome, limit=50):
+    """Short human readable reason for a failed outcome"""
+    if outcome.error is None:
+        return ''
+    if isinstance(outcome.error, FORWARDS_RESTRICTED_ERRORS) or 'protected' in str(outcome.error).lower():
+        return 'Source chat has forwarding protection'
+    return f"{outcome.error_class}: {str(outcome.error)[:limit]}"
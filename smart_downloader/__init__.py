@@ -0,0 +1,65 @@
+"""
+smart_downloader: async library API behind the command-line scripts
+
+    import asyncio
+    from smart_downloader import forward_range, upload_files, download_links
+
+    async def main():
+        result = await forward_range(-1003159701355, -1003305131927, 51, 56)
+        print(result.counts())
+
+    asyncio.run(main())
+
+Every call accepts an existing `client=` (left connected) or opens one from
+`session=` (default: the scripts' 'video_uploader' session, credentials from
+config.py). Progress is reported through callbacks instead of prints, and
+results come back as typed objects (see smart_downloader.results).
+"""
+import importlib
+
+from smart_downloader.downloading import download_links, find_tdl
+from smart_downloader.results import DownloadResult, ForwardResult, ItemResult, JobResult, UploadResult
+
+# These need Telethon, so they are imported on first use; the tdl download path works without it
+_TELETHON_EXPORTS = {
+    'client_context': 'smart_downloader.client',
+    'is_invite_link': 'smart_downloader.client',
+    'join_invite': 'smart_downloader.client',
+    'resolve_entity': 'smart_downloader.client',
+    'parse_date': 'smart_downloader.dates',
+    'resolve_date_range': 'smart_downloader.dates',
+    'forward_fanout': 'smart_downloader.forwarding',
+    'forward_range': 'smart_downloader.forwarding',
+    'download_messages': 'smart_downloader.native',
+    'find_videos': 'smart_downloader.uploading',
+    'upload_files': 'smart_downloader.uploading',
+}
+
+
+def __getattr__(name):
+    module = _TELETHON_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
+
+
+__all__ = [
+    'client_context',
+    'download_links',
+    'download_messages',
+    'find_tdl',
+    'find_videos',
+    'forward_fanout',
+    'forward_range',
+    'is_invite_link',
+    'join_invite',
+    'parse_date',
+    'resolve_date_range',
+    'resolve_entity',
+    'upload_files',
+    'DownloadResult',
+    'ForwardResult',
+    'ItemResult',
+    'JobResult',
+    'UploadResult',
+]
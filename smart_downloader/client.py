@@ -0,0 +1,68 @@
+"""
+Client helpers: reuse an existing TelegramClient or open one from a session
+"""
+from contextlib import asynccontextmanager
+
+from telethon import TelegramClient
+from telethon.tl import functions
+from telethon.tl.tlobject import TLObject
+
+import tracing
+
+DEFAULT_SESSION = 'video_uploader'
+
+
+@asynccontextmanager
+async def client_context(client=None, session=None, api_id=None, api_hash=None):
+    """
+    Yield a connected TelegramClient
+
+    An existing `client` is used as is and left connected. Otherwise a client is
+    created from `session` (a session name/path or a StringSession), connected,
+    and disconnected afterwards. API credentials default to config.py.
+    """
+    if client is not None:
+        yield client
+        return
+    if api_id is None or api_hash is None:
+        from config import API_ID, API_HASH
+        api_id = api_id or API_ID
+        api_hash = api_hash or API_HASH
+    async with tracing.connected(TelegramClient(session or DEFAULT_SESSION, api_id, api_hash)) as new_client:
+        yield new_client
+
+
+def is_invite_link(dest):
+    return isinstance(dest, str) and ('t.me/+' in dest or 'joinchat/' in dest or dest.startswith('+'))
+
+
+async def join_invite(client, invite_link):
+    """
+    Join a group by invite link (or look it up if already a member)
+
+    Returns:
+        (entity, joined) where joined is False if we were already a member
+    """
+    # Extract hash from invite link
+    invite_hash = invite_link.split('/')[-1].replace('+', '')
+
+    with tracing.span('join'):
+        try:
+            updates = await client(functions.messages.ImportChatInviteRequest(invite_hash))
+            return updates.chats[0], True
+        except Exception as e:
+            # Already a member, get the entity
+            if "already a participant" in str(e).lower() or "INVITE_REQUEST_SENT" in str(e):
+                return await client.get_entity(invite_link), False
+            raise
+
+
+async def resolve_entity(client, target):
+    """Resolve a chat ID, username or invite link; entities are returned unchanged"""
+    if isinstance(target, TLObject):
+        return target
+    if is_invite_link(target):
+        entity, _ = await join_invite(client, target)
+        return entity
+    with tracing.span('get_entity'):
+        return await client.get_entity(target)
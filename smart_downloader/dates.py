@@ -0,0 +1,217 @@
+"""
+Dates: resolve a date range to an inclusive message ID range
+
+A range bound is the first message ID sent at or after an instant. It is found
+with one history request (the newest message before the instant, via
+`offset_date`), or, for sessions that cannot read history (bots), by galloping
+and bisecting over `get_messages(ids=...)` batches in O(log n) requests.
+
+Bounds in the past never change, so they are cached per chat in
+date_bounds.json and reused by later runs. Bisection cannot tell a long run of
+deleted messages from the end of the chat, so its bounds past the last message
+it found are not cached.
+"""
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from telethon import errors
+
+import tracing
+from retry_engine import PERMANENT, classify_error
+
+CACHE_FILE = 'date_bounds.json'
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S']
+
+# IDs fetched per bisection probe
+PROBE_WIDTH = 20
+
+# An empty probe is widened this many IDs at a time (get_messages limit) before it counts as the end
+MAX_PROBE_WIDTH = 100
+
+# A run of deleted messages this long looks like the end of the chat
+MAX_GAP = 1000
+
+
+def parse_date(text):
+    """
+    Parse 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM[:SS]' (local time)
+
+    Returns:
+        (aware datetime, whole_day) or None if the text is not a date
+    """
+    if isinstance(text, datetime):
+        return (text if text.tzinfo else text.astimezone()), False
+    if isinstance(text, date):
+        return datetime(text.year, text.month, text.day).astimezone(), True
+    if not isinstance(text, str):
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+        return parsed.astimezone(), fmt == '%Y-%m-%d'
+    return None
+
+
+def is_date(value):
+    return parse_date(value) is not None
+
+
+def range_instants(start, end):
+    """
+    Turn start/end dates into a [start, end) pair of instants
+
+    A whole-day end covers that entire day ('2026-09-30' ends at midnight after it).
+    """
+    if not (is_date(start) and is_date(end)):
+        raise ValueError(f'both ends must be dates, got {start!r} and {end!r}')
+    start_at, _ = parse_date(start)
+    end_at, whole_day = parse_date(end)
+    end_at += timedelta(days=1) if whole_day else timedelta(seconds=1)
+    return start_at, end_at
+
+
+class BoundCache:
+    """Resolved bounds per chat, kept in a small JSON file"""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                self.data = json.load(fh)
+        except (OSError, ValueError):
+            self.data = {}
+
+    @staticmethod
+    def key(chat_id, when):
+        return f'{chat_id}|{int(when.timestamp())}'
+
+    def get(self, chat_id, when):
+        return self.data.get(self.key(chat_id, when))
+
+    def put(self, chat_id, when, msg_id):
+        self.data[self.key(chat_id, when)] = msg_id
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(self.data, fh, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+async def _bound_by_offset_date(client, entity, when):
+    # Newest message strictly before `when`; everything after it is at/after `when`
+    messages = await client.get_messages(entity, limit=1, offset_date=when)
+    return messages[0].id + 1 if messages else 1
+
+
+class _Prober:
+    """First existing message at or after an ID, looking past runs of deleted messages"""
+
+    def __init__(self, client, entity):
+        self.client = client
+        self.entity = entity
+        self.end = None  # IDs from here on are taken to be past the last message
+
+    async def first_from(self, msg_id):
+        """First existing message in [msg_id, msg_id + MAX_GAP), or None past the end of the chat"""
+        start, width = msg_id, PROBE_WIDTH
+        while (self.end is None or start < self.end) and start - msg_id < MAX_GAP:
+            stop = start + width if self.end is None else min(start + width, self.end)
+            messages = await self.client.get_messages(self.entity, ids=list(range(start, stop)))
+            message = next((m for m in messages if m is not None), None)
+            if message is not None:
+                return message
+            start, width = stop, MAX_PROBE_WIDTH
+        self.end = msg_id if self.end is None else min(self.end, msg_id)
+        return None
+
+
+async def _bound_by_bisection(client, entity, when):
+    """
+    Returns:
+        (bound, confirmed); confirmed is False when the bound lies past the last message
+        found, where a gap of more than MAX_GAP deleted IDs would look the same
+    """
+    prober = _Prober(client, entity)
+
+    def at_or_after(message):
+        return message is None or message.date >= when
+
+    # Gallop up to an ID at/after `when` (or past the end), then bisect down to the first one
+    lo, hi = 1, 1
+    while True:
+        message = await prober.first_from(hi)
+        if at_or_after(message):
+            break
+        lo = message.id + 1
+        hi = max(hi * 2, lo)
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        message = await prober.first_from(mid)
+        if at_or_after(message):
+            hi = mid
+        else:
+            lo = message.id + 1
+    return lo, prober.end is None or lo < prober.end
+
+
+async def first_id_at(client, entity, when, method='auto', cache=None):
+    """
+    First message ID sent at or after `when` (IDs below it are all older)
+
+    Args:
+        method: 'offset_date' (1 request), 'bisect' (O(log n) get_messages calls)
+                or 'auto' (offset_date, falling back to bisect where history is not allowed)
+        cache: Optional BoundCache; bounds in the past are read from and saved to it
+    """
+    chat_id = getattr(entity, 'id', entity)
+    if cache is not None:
+        cached = cache.get(chat_id, when)
+        if cached is not None:
+            return cached
+
+    confirmed = True
+    with tracing.span(f'resolve {when.isoformat()}', method=method):
+        if method == 'bisect':
+            bound, confirmed = await _bound_by_bisection(client, entity, when)
+        else:
+            try:
+                bound = await _bound_by_offset_date(client, entity, when)
+            except errors.RPCError as e:
+                if method != 'auto' or classify_error(e) != PERMANENT:
+                    raise
+                bound, confirmed = await _bound_by_bisection(client, entity, when)
+
+    # New messages can still arrive before a future instant, so only cache the past
+    if cache is not None and confirmed and when.timestamp() < time.time():
+        cache.put(chat_id, when, bound)
+    return bound
+
+
+async def resolve_date_range(client, entity, start, end, method='auto', cache=True):
+    """
+    Resolve a date range to message IDs
+
+    Args:
+        start, end: Dates ('2026-09-01'), datetimes or 'YYYY-MM-DD HH:MM' strings;
+                    a whole-day end includes that day
+        method: See first_id_at
+        cache: True for date_bounds.json, a BoundCache, or False to always ask Telegram
+
+    Returns:
+        (start_msg_id, end_msg_id), inclusive; start > end means no messages in the range
+    """
+    if cache is True:
+        cache = BoundCache()
+    elif cache is False:
+        cache = None
+    start_at, end_at = range_instants(start, end)
+    if end_at <= start_at:
+        raise ValueError(f'end {end} is before start {start}')
+    start_id = await first_id_at(client, entity, start_at, method, cache)
+    end_id = await first_id_at(client, entity, end_at, method, cache) - 1
+    return start_id, end_id
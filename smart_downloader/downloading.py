@@ -0,0 +1,192 @@
+"""
+Downloading: message links or tdl exports through one or more tdl processes
+
+Only the native backend needs Telethon, so smart_downloader.native is imported
+inside that branch and tdl downloads work without Telethon installed.
+"""
+import os
+import shutil
+import time
+from pathlib import Path
+
+import tracing
+from autotune import AutoTuner
+from export_stream import iter_messages, read_header, split_export
+from smart_downloader.links import parse_link, to_peer_id
+from smart_downloader.results import DownloadResult, ItemResult
+from tdl_runner import TdlJob, arun_jobs
+
+# auto: work is cut into this many slices and up to MAX_TDL_JOBS run at once
+AUTO_SLICES = 16
+MAX_TDL_JOBS = 8
+
+
+def find_tdl():
+    """Locate tdl: env TDL_PATH, the repo's tdl/bin, ./bin, then PATH; None if missing"""
+    # Check environment override
+    env = os.environ.get('TDL_PATH')
+    if env:
+        p = Path(env)
+        if p.exists():
+            return str(p)
+
+    # Check common repo bin location
+    repo_bin = Path(__file__).resolve().parent.parent / 'tdl' / 'bin' / 'tdl.exe'
+    if repo_bin.exists():
+        return str(repo_bin)
+
+    # Check current folder's bin
+    local_bin = Path.cwd() / 'bin' / 'tdl.exe'
+    if local_bin.exists():
+        return str(local_bin)
+
+    # On PATH
+    exe = shutil.which('tdl') or shutil.which('tdl.exe')
+    if exe:
+        return exe
+
+    return None
+
+
+def tdl_account():
+    """Auto-tune account key for tdl: its namespace (tdl reads TDL_NS, like its -n flag)"""
+    return f"tdl:{os.environ.get('TDL_NS') or 'default'}"
+
+
+def build_jobs(out_dir, links=None, export=None, jobs=1, group=False, takeout=False, desc=False):
+    """
+    Build the tdl jobs for a download
+
+    Links are split round-robin over `jobs` processes; an export is split into
+    `jobs` shard files next to it (returned so the caller can remove them).
+
+    Returns:
+        (list of TdlJob, list of shard paths)
+    """
+    flags = ['-d', str(out_dir)]
+    if group:
+        flags += ['--group']
+    if takeout:
+        flags += ['--takeout']
+    if desc:
+        flags += ['--desc']
+
+    tdl_jobs = []
+    shards = []
+    if export:
+        njobs = max(1, jobs)
+        if njobs == 1:
+            tdl_jobs.append(TdlJob(['download', '-f', str(export)] + flags, name='job1'))
+        else:
+            with tracing.span('split export'):
+                shards = split_export(export, njobs)
+            for i, shard in enumerate(shards):
+                tdl_jobs.append(TdlJob(['download', '-f', shard] + flags, name=f'job{i + 1}'))
+    else:
+        njobs = max(1, min(jobs, len(links)))
+        for i in range(njobs):
+            args = ['download']
+            for link in links[i::njobs]:
+                args += ['-u', link]
+            tdl_jobs.append(TdlJob(args + flags, name=f'job{i + 1}'))
+    return tdl_jobs, shards
+
+
+def export_items(export):
+    """(chat, message ID) pairs of a tdl chat export, for the native backend"""
+    chat = to_peer_id(int(read_header(export, ['id'])['id']))
+    return [(chat, int(msg['id'])) for msg in iter_messages(export)]
+
+
+async def download_links(links=None, out_dir='downloads', *, export=None, backend='tdl', tdl=None, jobs=1,
+                         auto=False, tuner=None, group=False, takeout=False, desc=False, on_event=None,
+                         on_jobs=None, echo=None, connections=None, client=None, session=None, api_id=None,
+                         api_hash=None):
+    """
+    Download message links (or a tdl chat export) with tdl or the native engine
+
+    Args:
+        links: Message links, e.g. https://t.me/c/12345/678
+        out_dir: Output directory
+        export: tdl chat export JSON to download from instead of links
+        backend: 'tdl' (external tdl processes) or 'native' (Telethon, see smart_downloader.native)
+        tdl: Path to the tdl executable (default: find_tdl())
+        jobs: Number of tdl processes (native: files) to run side by side
+        auto: Tune the number of parallel tdl processes (native: files) on measured bytes/s;
+              the best value is saved per tdl namespace (native: Telegram account) + out_dir
+        tuner: Use this autotune.AutoTuner instead of creating one (implies auto; the
+               caller calls tuner.finish())
+        group, takeout, desc: tdl's --group / --takeout / --desc (native: only desc)
+        on_event: Optional callback receiving every tdl_runner.TdlEvent
+        on_jobs: Optional callback `on_jobs(tdl, jobs)` before the jobs start (tdl only)
+        echo: Print tdl's raw output (default: only with a single job)
+        connections: Native only: connections per file (default: native.CONNECTIONS)
+        client, session, api_id, api_hash: Native only: Telegram client to use (see client_context)
+
+    Returns:
+        DownloadResult with one ItemResult per finished file
+    """
+    links = list(links or [])
+    if not links and not export:
+        raise ValueError('no links or export given')
+
+    if backend == 'native':
+        from smart_downloader import native
+        if group or takeout:
+            raise ValueError('--group and --takeout are only supported by the tdl backend')
+        items = export_items(export) if export else [parse_link(link) for link in links]
+        # The tuner is keyed by the Telegram account, so download_messages creates it once connected
+        return await native.download_messages(
+            items, out_dir, connections=connections or native.CONNECTIONS,
+            parallel_files=native.PARALLEL_FILES if auto or tuner else max(1, jobs),
+            auto=auto, tuner=tuner, desc=desc, on_event=on_event,
+            client=client, session=session, api_id=api_id, api_hash=api_hash,
+        )
+    if backend != 'tdl':
+        raise ValueError(f"unknown download backend: {backend!r}")
+
+    tdl = tdl or find_tdl()
+    if not tdl:
+        raise FileNotFoundError('tdl executable not found; set TDL_PATH or put tdl on PATH')
+
+    own_tuner = auto and tuner is None
+    if own_tuner:
+        tuner = AutoTuner('tdl_jobs', 2, 1, MAX_TDL_JOBS, window=30.0,
+                          account=tdl_account(), destination=os.path.abspath(out_dir))
+    if tuner is not None:
+        jobs = AUTO_SLICES
+
+    tdl_jobs, shards = build_jobs(out_dir, links, export, jobs, group, takeout, desc)
+    if on_jobs:
+        on_jobs(tdl, tdl_jobs)
+
+    items = []
+
+    def handle(event):
+        if event.kind == 'done':
+            items.append(ItemResult(event.name, 'ok', attempts=1, bytes=event.total or event.done or 0))
+        if on_event:
+            on_event(event)
+
+    started = time.monotonic()
+    try:
+        results = await arun_jobs(tdl, tdl_jobs, max_concurrency=len(tdl_jobs), on_event=handle,
+                                  echo=len(tdl_jobs) == 1 if echo is None else echo, tuner=tuner)
+    finally:
+        for shard in shards:
+            try:
+                os.remove(shard)
+            except OSError:
+                pass
+
+    if own_tuner:
+        tuner.finish()
+
+    # tdl reports file names and sizes, not message IDs
+    return DownloadResult(
+        items=items,
+        elapsed=time.monotonic() - started,
+        out_dir=str(out_dir),
+        returncodes=[r.returncode for r in results],
+        errors=[e for r in results for e in r.errors],
+    )
@@ -0,0 +1,389 @@
+"""
+Forwarding: message ranges from one chat to another
+"""
+import asyncio
+import time
+
+import tracing
+from retry_engine import FLOOD, PERMANENT, ItemOutcome, RetryPolicy, SkipItem, classify_error
+from smart_downloader.client import client_context, resolve_entity
+from smart_downloader.dates import is_date, resolve_date_range
+from smart_downloader.results import ForwardResult, ItemResult
+
+# Telegram forwards at most 100 messages per request
+MAX_FORWARD_BATCH = 100
+
+# Pause after each message in one-by-one mode to avoid rate limiting
+MESSAGE_DELAY = 0.5
+
+# Fan-out: batches a destination may fall behind the fetcher before fetching waits for it
+FANOUT_QUEUE_DEPTH = 8
+
+# Fan-out: pause between batches for each destination to stay clear of rate limits
+FANOUT_BATCH_DELAY = 0.5
+
+
+async def forward_each(client, source_entity, dest_entity, msg_ids, on_outcome=None, on_retry=None, policy=None):
+    """
+    Forward messages one by one, in order; returns ItemOutcomes
+
+    Each message is retried in place (see call_with_retries), so a retry never
+    lands in the destination after the messages that follow it.
+    """
+    policy = policy or RetryPolicy()
+    outcomes = []
+
+    for msg_id in msg_ids:
+        outcome = ItemOutcome(msg_id)
+
+        async def forward_one():
+            outcome.attempts += 1
+            with tracing.span(f'message {msg_id}', cat='item'):
+                # Get the message (re-fetched on retry, which also renews file references)
+                with tracing.span('get_messages'):
+                    message = await client.get_messages(source_entity, ids=msg_id)
+
+                if message is None:
+                    raise SkipItem()
+
+                with tracing.span('forward'):
+                    await client.forward_messages(
+                        entity=dest_entity,
+                        messages=msg_id,
+                        from_peer=source_entity
+                    )
+
+        try:
+            _, _, outcome.elapsed = await call_with_retries(forward_one, policy, msg_id, on_retry)
+            outcome.status = 'ok'
+        except SkipItem:
+            outcome.status = 'skipped'
+        except Exception as e:
+            outcome.status = 'failed'
+            outcome.error = e
+            outcome.error_class = classify_error(e)
+        outcomes.append(outcome)
+        if on_outcome:
+            on_outcome(outcome)
+
+        if outcome.status == 'ok':
+            with tracing.span('rate limit sleep'):
+                await asyncio.sleep(MESSAGE_DELAY)
+    return outcomes
+
+
+async def call_with_retries(call, policy, label, on_retry=None, tuner=None):
+    """
+    Await `call()`, retrying transient errors with backoff and waiting out FloodWaits in place
+
+    Used for forwards, where deferring a batch or message to the retry engine would
+    reorder the messages.
+
+    Args:
+        call: async callable making the request
+        label: Passed to on_retry as the item (e.g. '51-150')
+        tuner: Optional autotune.AutoTuner told about FloodWaits
+
+    Returns:
+        (result, attempts, elapsed) with the elapsed time of the successful attempt
+
+    Raises:
+        The last error once it is permanent, a FloodWait is longer than
+        policy.max_flood_wait, or policy.max_attempts is used up
+    """
+    attempts = 0
+    while True:
+        attempts += 1
+        start = time.monotonic()
+        try:
+            result = await call()
+        except Exception as e:
+            error_class = classify_error(e)
+            if error_class == PERMANENT or attempts >= policy.max_attempts:
+                raise
+            if error_class == FLOOD:
+                seconds = getattr(e, 'seconds', 0) or 0
+                if seconds > policy.max_flood_wait:
+                    raise
+                delay = seconds + 1
+                if tuner:
+                    tuner.flood(delay)
+            else:
+                delay = policy.backoff(attempts)
+            if on_retry:
+                on_retry(label, attempts, error_class, e, delay)
+            await asyncio.sleep(delay)
+            continue
+        return result, attempts, time.monotonic() - start
+
+
+async def forward_batched(client, source_entity, dest_entity, msg_ids, tuner=None, on_outcome=None, on_retry=None,
+                          policy=None, batch_size=MAX_FORWARD_BATCH):
+    """
+    Forward messages in batches (auto-tuned on messages/s when a tuner is given)
+
+    Each batch is fetched with one get_messages call and forwarded with one
+    forward_messages call. FloodWait shrinks the batch; a batch that fails with a
+    permanent error is retried message by message so only the bad ones fail.
+
+    Returns:
+        List of ItemOutcome, one per message ID
+    """
+    policy = policy or RetryPolicy()
+    outcomes = []
+    pos = 0
+
+    while pos < len(msg_ids):
+        size = tuner.value if tuner else batch_size
+        batch = msg_ids[pos:pos + size]
+        pos += len(batch)
+
+        async def fetch_and_forward():
+            with tracing.span(f'batch {batch[0]}-{batch[-1]}', cat='item', size=len(batch)):
+                with tracing.span('get_messages'):
+                    messages = await client.get_messages(source_entity, ids=batch)
+                present = [m.id for m in messages if m is not None]
+                if present:
+                    with tracing.span('forward'):
+                        await client.forward_messages(
+                            entity=dest_entity,
+                            messages=present,
+                            from_peer=source_entity
+                        )
+            return present
+
+        try:
+            present, attempts, elapsed = await call_with_retries(
+                fetch_and_forward, policy, f"{batch[0]}-{batch[-1]}", on_retry, tuner
+            )
+        except Exception:
+            # Isolate the bad message(s) by falling back to one-by-one forwarding
+            outcomes.extend(await forward_each(client, source_entity, dest_entity, batch,
+                                               on_outcome, on_retry, policy))
+            continue
+
+        present_ids = set(present)
+        for msg_id in batch:
+            outcome = ItemOutcome(msg_id, 'ok' if msg_id in present_ids else 'skipped', attempts, elapsed=elapsed)
+            outcomes.append(outcome)
+            if on_outcome:
+                on_outcome(outcome)
+        if tuner:
+            tuner.record(len(batch), latency=elapsed)
+
+    return outcomes
+
+
+async def forward_bulk(client, source_entity, dest_entity, msg_ids):
+    """Forward without fetching first, MAX_FORWARD_BATCH IDs per request; returns ItemOutcomes"""
+    outcomes = []
+    for pos in range(0, len(msg_ids), MAX_FORWARD_BATCH):
+        batch = msg_ids[pos:pos + MAX_FORWARD_BATCH]
+        start = time.monotonic()
+        with tracing.span('forward', messages=len(batch)):
+            sent = await client.forward_messages(
+                entity=dest_entity,
+                messages=batch,
+                from_peer=source_entity
+            )
+        elapsed = time.monotonic() - start
+        sent = sent if isinstance(sent, list) else [sent]
+        # Telegram leaves gaps (None) for deleted/empty messages
+        for msg_id, msg in zip(batch, sent + [None] * (len(batch) - len(sent))):
+            outcomes.append(ItemOutcome(msg_id, 'ok' if msg is not None else 'skipped', 1, elapsed=elapsed))
+    return outcomes
+
+
+async def forward_range(source, destination, start_msg_id=None, end_msg_id=None, *, msg_ids=None,
+                        mode='each', tuner=None, batch_size=MAX_FORWARD_BATCH, policy=None,
+                        on_outcome=None, on_retry=None,
+                        client=None, session=None, api_id=None, api_hash=None):
+    """
+    Forward a range of messages from one chat to another
+
+    Args:
+        source: Source chat ID, username or entity
+        destination: Destination chat ID, username, invite link or entity
+        start_msg_id, end_msg_id: Inclusive message ID range, or dates ('2026-09-01',
+                                  resolved through smart_downloader.dates; a whole-day end
+                                  includes that day)
+        msg_ids: Explicit list of message IDs
+        mode: 'each' (one by one with retries), 'batched' or 'bulk'
+        tuner: Optional autotune.AutoTuner for the batch size in 'batched' mode
+        on_outcome, on_retry: Progress callbacks (see retry_engine.RetryEngine)
+        client: Existing TelegramClient to reuse (left connected)
+        session, api_id, api_hash: Used to open a client when none is given
+
+    Returns:
+        ForwardResult with one ItemResult per message ID
+    """
+    started = time.monotonic()
+
+    async with client_context(client, session, api_id, api_hash) as client:
+        source_entity = await resolve_entity(client, source)
+        dest_entity = await resolve_entity(client, destination)
+
+        if msg_ids is None:
+            if is_date(start_msg_id) or is_date(end_msg_id):
+                start_msg_id, end_msg_id = await resolve_date_range(client, source_entity, start_msg_id, end_msg_id)
+            msg_ids = list(range(start_msg_id, end_msg_id + 1))
+
+        if mode == 'each':
+            outcomes = await forward_each(client, source_entity, dest_entity, msg_ids, on_outcome, on_retry, policy)
+        elif mode == 'batched':
+            outcomes = await forward_batched(client, source_entity, dest_entity, msg_ids, tuner,
+                                             on_outcome, on_retry, policy, batch_size)
+        elif mode == 'bulk':
+            outcomes = await forward_bulk(client, source_entity, dest_entity, msg_ids)
+        else:
+            raise ValueError(f"unknown forward mode: {mode!r}")
+
+    outcomes.sort(key=lambda o: o.item)
+    return ForwardResult(
+        items=[ItemResult.from_outcome(o) for o in outcomes],
+        elapsed=time.monotonic() - started,
+        source=source_entity,
+        destination=dest_entity,
+    )
+
+
+async def _fanout_worker(client, source_entity, dest_entity, label, queue, policy, on_outcome, on_retry, on_batch):
+    """Forward every batch queued for one fan-out destination; returns its ItemOutcomes"""
+    outcomes = []
+
+    def report(outcome):
+        outcomes.append(outcome)
+        if on_outcome:
+            on_outcome(dest_entity, outcome)
+
+    def retry_message(msg_id, *args):
+        if on_retry:
+            on_retry(f"{label}: message {msg_id}", *args)
+
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            return outcomes
+        present, skipped, error = batch
+        for msg_id in skipped:
+            report(ItemOutcome(msg_id, 'skipped', 0))
+        if error is not None:
+            # The batch could not be fetched, so it is failed for every destination
+            for msg_id in present:
+                report(ItemOutcome(msg_id, 'failed', 0, classify_error(error), error))
+            continue
+        if not present:
+            continue
+
+        async def forward():
+            with tracing.span(f'{label} {present[0]}-{present[-1]}', cat='item', size=len(present)):
+                await client.forward_messages(
+                    entity=dest_entity,
+                    messages=present,
+                    from_peer=source_entity
+                )
+
+        try:
+            _, attempts, elapsed = await call_with_retries(
+                forward, policy, f"{label}: batch {present[0]}-{present[-1]}", on_retry
+            )
+        except Exception:
+            # Isolate the bad message(s) for this destination only
+            await forward_each(client, source_entity, dest_entity, present, report, retry_message, policy)
+            continue
+
+        for msg_id in present:
+            report(ItemOutcome(msg_id, 'ok', attempts, elapsed=elapsed))
+        if on_batch:
+            on_batch(dest_entity, present)
+        await asyncio.sleep(FANOUT_BATCH_DELAY)
+
+
+async def forward_fanout(source, destinations, start_msg_id=None, end_msg_id=None, *, msg_ids=None,
+                         batch_size=MAX_FORWARD_BATCH, policy=None, on_outcome=None, on_retry=None, on_batch=None,
+                         client=None, session=None, api_id=None, api_hash=None):
+    """
+    Forward a message range to several destinations, fetching each source batch once
+
+    Every destination has its own bounded queue and worker, so a FloodWait or slow
+    link on one destination only slows that destination down.
+
+    Args:
+        source: Source chat ID, username or entity
+        destinations: Destination chat IDs, usernames, invite links or entities
+        start_msg_id, end_msg_id: Inclusive message ID range, or dates (see forward_range)
+        msg_ids: Explicit list of message IDs
+        batch_size: Messages fetched and forwarded per request (max 100)
+        on_outcome: Optional `on_outcome(destination_entity, outcome)` for every message and destination
+        on_retry: Optional `on_retry(item, attempt, error_class, error, delay)`; item names the
+                  destination and batch (or 'Fetch <first>-<last>')
+        on_batch: Optional `on_batch(destination_entity, msg_ids)` after a batch is forwarded
+        client: Existing TelegramClient to reuse (left connected)
+        session, api_id, api_hash: Used to open a client when none is given
+
+    Returns:
+        List of ForwardResult, one per destination in the given order
+    """
+    started = time.monotonic()
+    policy = policy or RetryPolicy()
+    batch_size = max(1, min(batch_size, MAX_FORWARD_BATCH))
+
+    async with client_context(client, session, api_id, api_hash) as client:
+        source_entity = await resolve_entity(client, source)
+        dest_entities = [await resolve_entity(client, dest) for dest in destinations]
+
+        if msg_ids is None:
+            if is_date(start_msg_id) or is_date(end_msg_id):
+                start_msg_id, end_msg_id = await resolve_date_range(client, source_entity, start_msg_id, end_msg_id)
+            msg_ids = list(range(start_msg_id, end_msg_id + 1))
+
+        queues = [asyncio.Queue(maxsize=FANOUT_QUEUE_DEPTH) for _ in dest_entities]
+        workers = [
+            asyncio.ensure_future(_fanout_worker(
+                client, source_entity, entity, getattr(entity, 'title', None) or str(dest), queue,
+                policy, on_outcome, on_retry, on_batch
+            ))
+            for dest, entity, queue in zip(destinations, dest_entities, queues)
+        ]
+
+        try:
+            for pos in range(0, len(msg_ids), batch_size):
+                ids = msg_ids[pos:pos + batch_size]
+
+                async def fetch():
+                    with tracing.span(f'fetch {ids[0]}-{ids[-1]}', cat='item'):
+                        return await client.get_messages(source_entity, ids=ids)
+
+                # Fetch the batch once for every destination
+                try:
+                    messages, _, _ = await call_with_retries(fetch, policy, f"Fetch {ids[0]}-{ids[-1]}", on_retry)
+                    present = [m.id for m in messages if m is not None]
+                    skipped = [msg_id for msg_id, m in zip(ids, messages) if m is None]
+                    batch = (present, skipped, None)
+                except Exception as e:
+                    batch = (ids, [], e)
+
+                # Bounded queues: the fetcher only waits when a destination is FANOUT_QUEUE_DEPTH batches behind
+                for queue in queues:
+                    await queue.put(batch)
+
+            for queue in queues:
+                await queue.put(None)
+            per_destination = await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+    elapsed = time.monotonic() - started
+    results = []
+    for entity, outcomes in zip(dest_entities, per_destination):
+        outcomes.sort(key=lambda o: o.item)
+        results.append(ForwardResult(
+            items=[ItemResult.from_outcome(o) for o in outcomes],
+            elapsed=elapsed,
+            source=source_entity,
+            destination=entity,
+        ))
+    return results
@@ -0,0 +1,28 @@
+"""
+Links: Telegram chat IDs and message links (no Telethon needed)
+"""
+import re
+
+LINK_RE = re.compile(r't\.me/(?:c/(?P<chat_id>\d+)|(?P<username>[A-Za-z]\w{3,}))/(?:\d+/)?(?P<msg_id>\d+)')
+
+
+def to_peer_id(chat_id):
+    """Accept 3399205162 (as in t.me/c links and tdl exports) or -1003399205162"""
+    return chat_id if chat_id < 0 else -1000000000000 - chat_id
+
+
+def parse_link(link):
+    """
+    Split a message link into (chat, message ID)
+
+    Accepts https://t.me/c/<chat>/<msg>, https://t.me/c/<chat>/<topic>/<msg> and
+    https://t.me/<username>/<msg>; chat is a -100 peer ID or a username.
+    """
+    match = LINK_RE.search(link)
+    if not match:
+        raise ValueError(f'not a message link: {link}')
+    if match.group('chat_id'):
+        chat = to_peer_id(int(match.group('chat_id')))
+    else:
+        chat = match.group('username')
+    return chat, int(match.group('msg_id'))
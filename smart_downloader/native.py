@@ -0,0 +1,458 @@
+"""
+Native downloads: a Telethon-only alternative to tdl
+
+Each file is fetched in PART_SIZE chunks over several MTProto connections to
+the DC that stores it (extra connections are opened per DC and shared by all
+files, like tdl/FastTelethon do). Chunks are written with positional writes into
+a pre-allocated `<name>.part` file, and the byte ranges already on disk are
+recorded in a `<name>.part.json` sidecar, so an interrupted download resumes
+where it stopped. Several files are downloaded at once through the retry engine;
+their messages are fetched 100 at a time and only re-fetched when a file
+reference expires.
+
+Files are named like tdl names them (`<chat>_<message>_<file name>`), so the
+two backends can be switched on the same output folder.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+from telethon import errors, utils
+from telethon.network import MTProtoSender
+from telethon.tl import types
+from telethon.tl.alltlobjects import LAYER
+from telethon.tl.functions import InvokeWithLayerRequest
+from telethon.tl.functions.auth import ExportAuthorizationRequest, ImportAuthorizationRequest
+from telethon.tl.functions.upload import GetFileRequest
+
+import tracing
+from autotune import AdjustableLimiter, AutoTuner, account_key
+from retry_engine import RetryEngine, SkipItem
+from smart_downloader.client import client_context, resolve_entity
+from smart_downloader.results import DownloadResult, ItemResult
+from tdl_runner import TdlEvent
+
+# upload.getFile limit: a multiple of 4 KiB that divides 1 MiB (offsets stay aligned to it)
+PART_SIZE = 512 * 1024
+
+# Connections per file and files downloaded at once
+CONNECTIONS = 4
+PARALLEL_FILES = 2
+MAX_PARALLEL_FILES = 8  # Upper bound when auto-tuning
+
+# Seconds between checkpoint saves (each save fsyncs the data first)
+CHECKPOINT_INTERVAL = 2.0
+
+# Seconds between 'progress' events per file
+PROGRESS_INTERVAL = 0.5
+
+# Messages fetched per get_messages request (Telegram limit)
+MESSAGES_BATCH = 100
+
+_UNSAFE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def file_name(chat_id, message):
+    """tdl-style name: <chat>_<message>_<file name>"""
+    name = message.file.name or f'{message.id}{message.file.ext or ""}'
+    return _UNSAFE.sub('_', f'{chat_id}_{message.id}_{name}')
+
+
+class SenderPool:
+    """Extra MTProto connections per DC, shared by every file stored there"""
+
+    def __init__(self, client):
+        self.client = client
+        self._senders = {}
+        self._auth_keys = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, dc_id, count):
+        """Return `count` connected senders for a DC, replacing dropped ones and opening new ones as needed"""
+        async with self._lock:
+            senders = self._senders.setdefault(dc_id, [])
+            # A sender whose connection died (and did not reconnect) fails every request
+            senders[:] = [s for s in senders if s.is_connected()]
+            while len(senders) < count:
+                with tracing.span(f'connect dc{dc_id}'):
+                    senders.append(await self._connect(dc_id))
+            return senders[:count]
+
+    async def _connect(self, dc_id):
+        client = self.client
+        dc = await client._get_dc(dc_id)
+        auth_key = self._auth_keys.get(dc_id)
+        if auth_key is None and dc_id == client.session.dc_id:
+            auth_key = client.session.auth_key
+
+        sender = MTProtoSender(auth_key, loggers=client._log)
+        await sender.connect(client._connection(
+            dc.ip_address, dc.port, dc.id, loggers=client._log, proxy=client._proxy
+        ))
+        if auth_key is None:
+            # First connection to another DC: export our login to it once, then reuse its key
+            auth = await client(ExportAuthorizationRequest(dc_id))
+            client._init_request.query = ImportAuthorizationRequest(id=auth.id, bytes=auth.bytes)
+            await sender.send(InvokeWithLayerRequest(LAYER, client._init_request))
+            self._auth_keys[dc_id] = sender.auth_key
+        return sender
+
+    async def close(self):
+        for senders in self._senders.values():
+            for sender in senders:
+                await sender.disconnect()
+        self._senders.clear()
+
+
+class Checkpoint:
+    """Sidecar JSON recording which byte ranges of a .part file are written"""
+
+    def __init__(self, path, key, size, part_path):
+        self.path = path
+        self.key = key
+        self.size = size
+        self.ranges = []
+        self._lock = threading.Lock()  # Saves run in executor threads
+        # Without the pre-allocated .part file the recorded ranges would claim zeros
+        try:
+            if os.path.getsize(part_path) != size:
+                return
+        except OSError:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return
+        # A sidecar for a different message or size means the .part file is stale
+        if data.get('key') == key and data.get('size') == size:
+            self.ranges = [list(r) for r in data.get('ranges', [])]
+
+    @property
+    def done(self):
+        return sum(end - start for start, end in self.ranges)
+
+    def add(self, start, end):
+        ranges = sorted(self.ranges + [[start, end]])
+        merged = [ranges[0]]
+        for lo, hi in ranges[1:]:
+            if lo <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        self.ranges = merged
+
+    def covers(self, start, end):
+        return any(lo <= start and end <= hi for lo, hi in self.ranges)
+
+    def missing(self, part_size):
+        """Offsets of the parts still to download"""
+        return [offset for offset in range(0, self.size, part_size)
+                if not self.covers(offset, min(offset + part_size, self.size))]
+
+    def snapshot(self):
+        """Copy of the ranges, for saving from another thread while parts keep arriving"""
+        return [list(r) for r in self.ranges]
+
+    def save(self, ranges=None):
+        tmp = f'{self.path}.tmp'
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump({'key': self.key, 'size': self.size,
+                           'ranges': self.ranges if ranges is None else ranges}, fh)
+            os.replace(tmp, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+_seek_lock = threading.Lock()
+
+
+def _pwrite(fd, data, offset):
+    """Write all of `data` at `offset` without moving a shared file position"""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, view, offset)
+        else:
+            # Windows has no pwrite: seek + write under a lock
+            with _seek_lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+def _sync(fd, checkpoint, ranges):
+    os.fsync(fd)  # Data must be on disk before the checkpoint claims it
+    checkpoint.save(ranges)
+
+
+async def _drain(jobs):
+    """Wait for executor jobs that still use a file descriptor, even if cancelled meanwhile"""
+    cancelled = False
+    while jobs:
+        try:
+            await asyncio.shield(asyncio.gather(*jobs, return_exceptions=True))
+        except asyncio.CancelledError:
+            cancelled = True  # The threads keep running, so the fd must stay open until they finish
+    if cancelled:
+        raise asyncio.CancelledError()
+
+
+def _preallocate(fd, size):
+    if os.fstat(fd).st_size == size:
+        return
+    os.ftruncate(fd, size)
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            pass  # Sparse file is fine (e.g. filesystems without fallocate)
+
+
+class _CdnRedirect(Exception):
+    pass
+
+
+async def _fetch_parts(pool, dc_id, location, fd, checkpoint, connections, on_part, run):
+    """
+    Download every missing part over up to `connections` senders
+
+    Args:
+        run: `run(func, *args)` starts `func` in an executor thread the caller tracks (until the
+             thread finishes, so await it through asyncio.shield)
+    """
+    missing = checkpoint.missing(PART_SIZE)
+    if not missing:
+        return
+    todo = iter(missing)
+    senders = await pool.get(dc_id, min(connections, len(missing)))
+
+    async def worker(sender):
+        for offset in todo:
+            result = await sender.send(GetFileRequest(location, offset=offset, limit=PART_SIZE))
+            if isinstance(result, types.upload.FileCdnRedirect):
+                raise _CdnRedirect()
+            length = min(PART_SIZE, checkpoint.size - offset)
+            if len(result.bytes) < length:
+                raise ConnectionError(f'short read at offset {offset}: {len(result.bytes)}/{length} bytes')
+            await asyncio.shield(run(_pwrite, fd, result.bytes[:length], offset))
+            checkpoint.add(offset, offset + length)
+            on_part(length)
+
+    tasks = [asyncio.ensure_future(worker(s)) for s in senders]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def download_file(client, pool, chat_id, message, out_dir, connections=CONNECTIONS, on_event=None):
+    """
+    Download the file of one message with several connections, resuming a previous attempt
+
+    Args:
+        chat_id: Chat ID used in the file name and checkpoint (the entity's own ID, as tdl uses)
+
+    Returns:
+        (path, size)
+    """
+    name = file_name(chat_id, message)
+    path = os.path.join(out_dir, name)
+    size = message.file.size or 0
+
+    def emit(kind, done=None, message_text=None):
+        if on_event:
+            percent = done * 100.0 / size if done is not None and size else None
+            on_event(TdlEvent(kind, 'native', name=name, done=done, total=size, percent=percent,
+                              message=message_text))
+
+    # Same as tdl's default skip of identical files
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        emit('done', size)
+        return path, size
+
+    part_path = f'{path}.part'
+    checkpoint = Checkpoint(f'{part_path}.json', f'{chat_id}/{message.id}', size, part_path)
+    dc_id, location = utils.get_input_location(message.media)
+    emit('started', checkpoint.done)
+
+    loop = asyncio.get_running_loop()
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+    last_save = last_progress = time.monotonic()
+    jobs = set()  # Executor jobs using fd; it is closed only after they finish
+    saving = None
+
+    def run(func, *args):
+        job = loop.run_in_executor(None, func, *args)
+        jobs.add(job)
+        job.add_done_callback(jobs.discard)
+        return job
+
+    def on_part(length):
+        nonlocal last_save, last_progress, saving
+        now = time.monotonic()
+        if now - last_save >= CHECKPOINT_INTERVAL and (saving is None or saving.done()):
+            # In the background, so the loop keeps serving the other connections
+            saving = run(_sync, fd, checkpoint, checkpoint.snapshot())
+            last_save = now
+        if now - last_progress >= PROGRESS_INTERVAL:
+            emit('progress', checkpoint.done)
+            last_progress = now
+
+    try:
+        with tracing.span(f'file {name}', cat='item', bytes=size):
+            _preallocate(fd, size)
+            try:
+                await _fetch_parts(pool, dc_id, location, fd, checkpoint, connections, on_part, run)
+            except errors.FileMigrateError as e:
+                # Stored on another DC than the media says: continue from there
+                await _fetch_parts(pool, e.new_dc, location, fd, checkpoint, connections, on_part, run)
+            # Shielded: cancelling a caller must not mark a job done while its thread still runs
+            if saving is not None:
+                await asyncio.shield(saving)
+            await asyncio.shield(run(os.fsync, fd))
+    except _CdnRedirect:
+        # CDN files need a different request flow, which Telethon implements
+        await _drain(jobs)
+        os.close(fd)
+        fd = None
+        checkpoint.remove()
+        await client.download_media(message, file=part_path)
+    except BaseException:
+        await _drain(jobs)
+        run(_sync, fd, checkpoint, checkpoint.snapshot())
+        raise
+    finally:
+        if fd is not None:
+            try:
+                await _drain(jobs)
+            finally:
+                os.close(fd)
+
+    os.replace(part_path, path)
+    checkpoint.remove()
+    emit('done', size)
+    return path, size
+
+
+async def download_messages(items, out_dir, *, connections=CONNECTIONS, parallel_files=PARALLEL_FILES,
+                            auto=False, tuner=None, desc=False, on_event=None, on_outcome=None, on_retry=None,
+                            policy=None, client=None, session=None, api_id=None, api_hash=None):
+    """
+    Download the files of messages with the native engine
+
+    Args:
+        items: (chat, message ID) pairs; chat is a peer ID, username or entity
+        out_dir: Output directory
+        connections: Connections used per file
+        parallel_files: Files downloaded at once
+        auto: Tune the number of parallel files on measured bytes/s; the best value is
+              saved per Telegram account + output directory
+        tuner: Use this autotune.AutoTuner instead of creating one (implies auto; the
+               caller calls tuner.finish())
+        desc: Newest first
+        on_event: Optional callback receiving tdl_runner.TdlEvent ('started', 'progress', 'done')
+        on_outcome, on_retry: Retry engine callbacks, one outcome per message
+        client: Existing TelegramClient to reuse (left connected)
+        session, api_id, api_hash: Used to open a client when none is given
+
+    Returns:
+        DownloadResult with one ItemResult per message (skipped if it has no file)
+    """
+    items = sorted(items, key=lambda i: i[1], reverse=desc)
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.monotonic()
+    limiter = AdjustableLimiter(parallel_files)
+
+    async with client_context(client, session, api_id, api_hash) as client:
+        own_tuner = auto and tuner is None
+        if own_tuner:
+            tuner = AutoTuner('native_files', PARALLEL_FILES, 1, MAX_PARALLEL_FILES, window=30.0,
+                              account=await account_key(client), destination=os.path.abspath(out_dir))
+        entities = {}
+        for chat, _ in items:
+            if chat not in entities:
+                entities[chat] = await resolve_entity(client, chat)
+        pool = SenderPool(client)
+
+        # Messages are fetched in batches the first time one of them is needed
+        batches = []
+        batch_of = {}
+        for chat in entities:
+            ids = [msg_id for c, msg_id in items if c == chat]
+            for start in range(0, len(ids), MESSAGES_BATCH):
+                for msg_id in ids[start:start + MESSAGES_BATCH]:
+                    batch_of[(chat, msg_id)] = len(batches)
+                batches.append((chat, ids[start:start + MESSAGES_BATCH]))
+        loading = {}
+        messages = {}
+
+        async def load(index):
+            chat, ids = batches[index]
+            with tracing.span('get_messages', count=len(ids)):
+                found = await client.get_messages(entities[chat], ids=ids)
+            for msg_id, message in zip(ids, found):
+                messages.setdefault((chat, msg_id), message)
+
+        async def refresh(item):
+            # Only an expired file reference needs the message again
+            chat, msg_id = item
+            with tracing.span('get_messages'):
+                messages[item] = await client.get_messages(entities[chat], ids=msg_id)
+
+        async def fetch_one(item):
+            if item not in messages:
+                index = batch_of[item]
+                task = loading.get(index)
+                if task is None or (task.done() and (task.cancelled() or task.exception())):
+                    task = loading[index] = asyncio.ensure_future(load(index))
+                # Shared by every file of the batch, so one cancelled file must not cancel it
+                await asyncio.shield(task)
+            chat, _ = item
+            message = messages[item]
+            if message is None or message.file is None:
+                raise SkipItem()
+            chat_id = getattr(entities[chat], 'id', chat)
+            return await download_file(client, pool, chat_id, message, out_dir, connections, on_event)
+
+        def handle_outcome(outcome):
+            messages.pop(outcome.item, None)
+            if tuner and outcome.status == 'ok':
+                tuner.record(outcome.result[1], latency=outcome.elapsed)
+            if on_outcome:
+                on_outcome(outcome)
+
+        try:
+            engine = RetryEngine(fetch_one, policy=policy, on_outcome=handle_outcome, on_retry=on_retry,
+                                 refresh=refresh, limiter=limiter, max_concurrency=max(parallel_files, tuner.maximum if tuner else 0))
+            with tuner.bind(limiter.set_limit) if tuner else contextlib.nullcontext():
+                outcomes = await engine.run(items)
+        finally:
+            for task in loading.values():
+                task.cancel()
+            await pool.close()
+
+    if own_tuner:
+        tuner.finish()
+
+    results = []
+    for outcome in outcomes:
+        if outcome.status == 'ok':
+            path, size = outcome.result
+            results.append(ItemResult.from_outcome(outcome, item=path, size=size))
+        else:
+            results.append(ItemResult.from_outcome(outcome, item=f'{outcome.item[0]}/{outcome.item[1]}'))
+    return DownloadResult(items=results, elapsed=time.monotonic() - started, out_dir=str(out_dir))
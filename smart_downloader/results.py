@@ -0,0 +1,84 @@
+"""
+Typed result objects returned by the library API
+"""
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+
+@dataclass
+class ItemResult:
+    item: Any  # Message ID, file path or file name
+    status: str  # 'ok', 'failed' or 'skipped'
+    attempts: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0  # Seconds spent on this item, retries included
+    error: Optional[str] = None
+    error_class: Optional[str] = None  # See retry_engine: transient, flood, file_reference, permanent
+
+    @classmethod
+    def from_outcome(cls, outcome, item=None, size=0):
+        """Build from a retry_engine.ItemOutcome"""
+        return cls(
+            item=outcome.item if item is None else item,
+            status=outcome.status,
+            attempts=outcome.attempts,
+            bytes=size if outcome.status == 'ok' else 0,
+            elapsed=outcome.elapsed,
+            error=str(outcome.error) if outcome.error is not None and outcome.status == 'failed' else None,
+            error_class=outcome.error_class if outcome.status == 'failed' else None,
+        )
+
+
+@dataclass
+class JobResult:
+    items: List[ItemResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def _with(self, status):
+        return [i for i in self.items if i.status == status]
+
+    @property
+    def succeeded(self):
+        return self._with('ok')
+
+    @property
+    def failed(self):
+        return self._with('failed')
+
+    @property
+    def skipped(self):
+        return self._with('skipped')
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    @property
+    def bytes(self):
+        return sum(i.bytes for i in self.items)
+
+    def counts(self):
+        return {'ok': len(self.succeeded), 'failed': len(self.failed), 'skipped': len(self.skipped)}
+
+
+@dataclass
+class ForwardResult(JobResult):
+    source: Any = None
+    destination: Any = None
+
+
+@dataclass
+class UploadResult(JobResult):
+    destination: Any = None
+    albums: int = 0  # Number of media groups sent (album mode)
+
+
+@dataclass
+class DownloadResult(JobResult):
+    out_dir: str = ''
+    returncodes: List[Optional[int]] = field(default_factory=list)  # One per tdl process (tdl backend)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.failed and all(rc == 0 for rc in self.returncodes)
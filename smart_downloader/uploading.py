@@ -0,0 +1,224 @@
+"""
+Uploading: videos as streaming media, one by one or as albums
+"""
+import asyncio
+import contextlib
+import os
+import time
+
+from telethon import utils
+from telethon.tl import types
+
+import tracing
+from autotune import AdjustableLimiter, AutoTuner, account_key
+from retry_engine import FLOOD, RetryEngine
+from smart_downloader.client import client_context, resolve_entity
+from smart_downloader.results import ItemResult, UploadResult
+
+VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv']
+
+# Telegram allows at most 10 items in one media group
+ALBUM_SIZE = 10
+
+# Upper bound for parallel uploads when auto-tuning
+MAX_UPLOAD_WORKERS = 6
+
+
+def find_videos(folder_path, extensions=VIDEO_EXTENSIONS):
+    """Return the video files of a folder as (filename, path) tuples, sorted by filename"""
+    video_files = []
+    with tracing.span('scan folder'):
+        for filename in os.listdir(folder_path):
+            if any(filename.lower().endswith(ext) for ext in extensions):
+                video_files.append((filename, os.path.join(folder_path, filename)))
+    video_files.sort(key=lambda x: x[0])
+    return video_files
+
+
+def video_media(path, handle):
+    """
+    Album item for an uploaded file, with attributes read from the file itself
+
+    A bare InputFile only carries a name, so Telethon would send it with an empty
+    DocumentAttributeVideo; reading the path (duration, size) keeps albums on par
+    with single-file sends.
+    """
+    attributes, mime_type = utils.get_attributes(path, supports_streaming=True)
+    return types.InputMediaUploadedDocument(
+        file=handle,
+        mime_type=mime_type or 'application/octet-stream',
+        attributes=attributes,
+        nosound_video=True
+    )
+
+
+def group_progress(sizes, progress_callback):
+    """Create per-file callbacks that report the combined progress of a group"""
+    done = [0] * len(sizes)
+    total = sum(sizes)
+
+    def make(i):
+        def callback(current, _total):
+            done[i] = current
+            progress_callback(sum(done), total)
+        return callback
+
+    return [make(i) for i in range(len(sizes))]
+
+
+async def upload_files(files, destination, *, captions=None, album=False, auto=False, tuner=None,
+                       max_workers=MAX_UPLOAD_WORKERS, attributes=None, progress_callback=None,
+                       on_start=None, on_outcome=None, on_retry=None, policy=None,
+                       client=None, session=None, api_id=None, api_hash=None):
+    """
+    Upload files as streaming videos, in order
+
+    Args:
+        files: File paths, sent in the given order
+        destination: Chat ID, username, invite link or entity
+        captions: One caption per file (defaults to the file names)
+        album: Send consecutive files as albums of up to ALBUM_SIZE (parts upload concurrently)
+        auto: Upload several files/albums at once, auto-tuning how many on measured bytes/s
+              (sends still happen in order); the best value is saved per account + destination
+        tuner: Use this autotune.AutoTuner instead of creating one (implies auto; the
+               caller calls tuner.finish())
+        max_workers: Upper bound for parallel uploads
+        attributes: Extra document attributes for single-file sends
+        progress_callback: Telethon-style `callback(current, total)`; only used when not parallel
+        on_start: Optional `on_start(index, total, names, size)` when an item (file or album) starts
+        on_outcome: Optional `on_outcome(outcome)` with a retry_engine.ItemOutcome per item
+        on_retry: Optional `on_retry(item, attempt, error_class, error, delay)`
+        client: Existing TelegramClient to reuse (left connected)
+        session, api_id, api_hash: Used to open a client when none is given
+
+    Returns:
+        UploadResult with one ItemResult per file
+    """
+    files = list(files)
+    captions = list(captions) if captions else [os.path.basename(f) for f in files]
+    sizes = {f: os.path.getsize(f) for f in files}
+    started = time.monotonic()
+
+    if album:
+        groups = [list(range(i, min(i + ALBUM_SIZE, len(files)))) for i in range(0, len(files), ALBUM_SIZE)]
+    else:
+        groups = [[i] for i in range(len(files))]
+    items = list(enumerate(groups, 1))
+
+    # Parallel uploads finish out of order, so each item waits for the
+    # previous one to be sent (or to finally fail) before sending itself
+    limiter = AdjustableLimiter(1)
+    sent = [asyncio.Event() for _ in items]
+    waited = [0.0] * len(items)
+
+    async def wait_turn(index):
+        if index == 1 or sent[index - 2].is_set():
+            return
+        # Give the upload slot back meanwhile: the previous item may need it for its retry
+        start = time.monotonic()
+        limiter.release()
+        try:
+            await sent[index - 2].wait()
+        finally:
+            await limiter.acquire()
+            waited[index - 1] += time.monotonic() - start
+
+    async with client_context(client, session, api_id, api_hash) as client:
+        entity = await resolve_entity(client, destination)
+
+        own_tuner = auto and tuner is None
+        if own_tuner:
+            tuner = AutoTuner(
+                'album_workers' if album else 'upload_workers', 1, 1, max_workers,
+                window=30.0, account=await account_key(client), destination=str(destination)
+            )
+        parallel = tuner is not None
+
+        async def upload_one(item):
+            index, members = item
+            paths = [files[i] for i in members]
+            names = [os.path.basename(p) for p in paths]
+            item_size = sum(sizes[p] for p in paths)
+            if on_start:
+                on_start(index, len(items), names, item_size)
+
+            if album:
+                callbacks = [None] * len(paths)
+                if progress_callback and not parallel:
+                    callbacks = group_progress([sizes[p] for p in paths], progress_callback)
+
+                async def upload_part(i, path):
+                    with tracing.span(f'upload {names[i]}', cat='item', bytes=sizes[path]):
+                        handle = await client.upload_file(path, progress_callback=callbacks[i])
+                    return video_media(path, handle)
+
+                with tracing.span(f'album {index}', cat='item', bytes=item_size):
+                    media = await asyncio.gather(*[upload_part(i, p) for i, p in enumerate(paths)])
+                    await wait_turn(index)
+                    with tracing.span('send album'):
+                        await client.send_file(
+                            entity,
+                            list(media),
+                            caption=[captions[i] for i in members],  # Per-item captions
+                            supports_streaming=True,
+                            force_document=False
+                        )
+            else:
+                with tracing.span(f'upload {names[0]}', cat='item', bytes=item_size):
+                    if parallel:
+                        # Upload in parallel (no shared progress bar), send in order
+                        handle = await client.upload_file(paths[0])
+                        await wait_turn(index)
+                        await client.send_file(
+                            entity,
+                            video_media(paths[0], handle),
+                            caption=captions[members[0]],
+                            supports_streaming=True,
+                            force_document=False
+                        )
+                    else:
+                        await wait_turn(index)
+                        await client.send_file(
+                            entity,
+                            paths[0],
+                            caption=captions[members[0]],
+                            supports_streaming=True,  # Playable inline
+                            force_document=False,  # Don't force as document/file
+                            progress_callback=progress_callback,
+                            attributes=attributes
+                        )
+
+        def handle_retry(item, attempt, error_class, error, delay):
+            if tuner and error_class == FLOOD:
+                tuner.flood(delay)
+            if on_retry:
+                on_retry(item, attempt, error_class, error, delay)
+
+        def handle_outcome(outcome):
+            index, members = outcome.item
+            sent[index - 1].set()  # Final (sent or given up), so the next item may send
+            if tuner and outcome.status == 'ok':
+                # Time spent waiting for the previous send is not upload latency
+                tuner.record(sum(sizes[files[i]] for i in members), latency=outcome.elapsed - waited[index - 1])
+            if on_outcome:
+                on_outcome(outcome)
+
+        # A failed upload does not abort the rest; transient errors are retried later
+        engine = RetryEngine(upload_one, policy=policy, on_outcome=handle_outcome, on_retry=handle_retry,
+                             limiter=limiter, max_concurrency=max_workers if parallel else 1)
+        with tuner.bind(limiter.set_limit) if tuner else contextlib.nullcontext():
+            outcomes = await engine.run(items)
+
+    if own_tuner:
+        tuner.finish()
+
+    results = []
+    for outcome in outcomes:
+        for i in outcome.item[1]:
+            results.append(ItemResult.from_outcome(outcome, item=files[i], size=sizes[files[i]]))
+    return UploadResult(
+        items=results,
+        elapsed=time.monotonic() - started,
+        destination=entity,
+        albums=len(groups) if album else 0,
+    )
@@ -7,48 +7,39 @@ Features:
 - Locate `tdl.exe` (looks in env TDL_PATH, repo bin folder, or PATH)
 - Accept single link(s) or a file with links (one per line)
 - Run `tdl download` with common flags and report output
+- `--jobs N` to split the links across N tdl processes running side by side
+- `--jobs auto` to tune the number of parallel tdl processes on measured MB/s
+- `--export` to download from a `tdl chat export` JSON file (sharded across `--jobs`)
 - Optional `--login` to trigger interactive login before download
 - `--check` to verify tdl is callable and print version
+- `--trace FILE` / `--profile FILE` to record phase timings or a cProfile dump
+- `--backend native` to download with Telethon instead of tdl (several connections per file,
+  resumable `.part` files; uses the `video_uploader` session and config.py)
 
 Usage examples:
   python tdl_downloader.py --link "https://t.me/c/12345/678" --out downloads
   python tdl_downloader.py --file links.txt --out downloads --takeout
+  python tdl_downloader.py --file links.txt --out downloads --jobs 3
+  python tdl_downloader.py --export export_12345_400_700.json --out downloads --jobs 4
+  python tdl_downloader.py --export export_12345_400_700.json --out downloads --jobs auto
+  python tdl_downloader.py --file links.txt --out downloads --backend native --jobs 3
   python tdl_downloader.py --check
 
 """
 
 import argparse
+import asyncio
+import importlib.util
 import os
-import shutil
 import subprocess
 import sys
 from pathlib import Path
 
-
-def find_tdl():
-    # Check environment override
-    env = os.environ.get('TDL_PATH')
-    if env:
-        p = Path(env)
-        if p.exists():
-            return str(p)
-
-    # Check common repo bin location
-    repo_bin = Path(__file__).resolve().parent / 'tdl' / 'bin' / 'tdl.exe'
-    if repo_bin.exists():
-        return str(repo_bin)
-
-    # Check current folder's bin
-    local_bin = Path.cwd() / 'bin' / 'tdl.exe'
-    if local_bin.exists():
-        return str(local_bin)
-
-    # On PATH
-    exe = shutil.which('tdl') or shutil.which('tdl.exe')
-    if exe:
-        return exe
-
-    return None
+import tracing
+from autotune import AutoTuner, account_key
+from smart_downloader import download_links, find_tdl
+from smart_downloader.downloading import MAX_TDL_JOBS, tdl_account
+from tdl_runner import print_event
 
 
 def run(cmd, capture=False):
@@ -68,6 +59,7 @@ def main():
     group = p.add_mutually_exclusive_group(required=False)
     group.add_argument('--link', '-u', action='append', help='Telegram message link (can be specified multiple times)')
     group.add_argument('--file', '-f', help='File with message links, one per line')
+    group.add_argument('--export', '-e', help='tdl chat export JSON file to download from')
     p.add_argument('--out', '-d', default=str(Path.cwd() / 'downloads'), help='Output directory')
     p.add_argument('--group', action='store_true', help='Treat albums/groups')
     p.add_argument('--takeout', action='store_true', help='Use takeout mode')
@@ -75,16 +67,37 @@ def main():
     p.add_argument('--login', action='store_true', help='Run interactive login before download')
     p.add_argument('--check', action='store_true', help='Check tdl availability and print version')
     p.add_argument('--tdl-path', help='Explicit path to tdl executable')
+    p.add_argument('--jobs', '-j', default='1', help="Number of tdl processes (native: files) to run in parallel, or 'auto'")
+    p.add_argument('--backend', choices=['tdl', 'native'], default='tdl', help='Download with tdl or with Telethon')
+    p.add_argument('--connections', type=int, help='Native backend: connections per file (default: 4)')
+    tracing.add_arguments(p)
 
     args = p.parse_args()
+    tracing.start(args.trace, args.profile)
+
+    auto = args.jobs == 'auto'
+    if not auto:
+        try:
+            args.jobs = int(args.jobs)
+        except ValueError:
+            p.error("--jobs must be a number or 'auto'")
+
+    if args.backend == 'native' and (args.check or args.login or args.group or args.takeout):
+        p.error('--check, --login, --group and --takeout need the tdl backend')
+
+    if args.backend == 'native' and importlib.util.find_spec('telethon') is None:
+        print('The native backend needs Telethon: pip install telethon', file=sys.stderr)
+        sys.exit(2)
 
     tdl = args.tdl_path or find_tdl()
-    if not tdl:
+    if not tdl and args.backend == 'tdl':
         print('tdl executable not found. Set TDL_PATH or place tdl.exe in e.g. ./tdl/bin/tdl.exe or on PATH.', file=sys.stderr)
+        print('Or download without tdl: --backend native', file=sys.stderr)
         sys.exit(2)
 
     # Normalize path
-    tdl = str(Path(tdl).resolve())
+    if tdl:
+        tdl = str(Path(tdl).resolve())
 
     if args.check:
         code, out = run([tdl, 'version'], capture=True)
@@ -118,29 +131,69 @@ def main():
                 if s:
                     links.append(s)
 
-    if not links:
-        print('No links provided. Use --link or --file.', file=sys.stderr)
+    if args.export and not Path(args.export).exists():
+        print(f'Export file not found: {args.export}', file=sys.stderr)
+        sys.exit(2)
+
+    if not links and not args.export:
+        print('No links provided. Use --link, --file or --export.', file=sys.stderr)
         sys.exit(2)
 
-    # Build tdl args
-    base = [tdl, 'download']
-    for l in links:
-        base += ['-u', l]
-    base += ['-d', args.out]
-    if args.group:
-        base += ['--group']
-    if args.takeout:
-        base += ['--takeout']
-    if args.desc:
-        base += ['--desc']
-
-    print('Running tdl with:', ' '.join(base))
-
-    rc, _ = run(base)
-    if rc != 0:
+    # One tdl job per slice of links (or shard of the export); native runs --jobs files at once
+    what = 'parallel files' if args.backend == 'native' else 'parallel tdl processes'
+
+    def on_change(n):
+        print(f'Auto-tune: {n} {what}')
+
+    def make_tuner(name, initial, maximum, account):
+        # Saved per tdl namespace / Telegram account and output folder
+        tuner = AutoTuner(name, initial, 1, maximum, window=30.0, account=account,
+                          destination=os.path.abspath(args.out), on_change=on_change)
+        print(f'Auto-tune: starting with {tuner.value} {what}')
+        return tuner
+
+    def on_jobs(tdl, jobs):
+        for job in jobs:
+            print('Running tdl with:', ' '.join([tdl] + job.args))
+
+    async def download():
+        kwargs = dict(export=args.export, backend=args.backend, tdl=tdl, jobs=1 if auto else args.jobs,
+                      group=args.group, takeout=args.takeout, desc=args.desc, on_event=print_event,
+                      on_jobs=on_jobs, connections=args.connections)
+        if args.backend == 'tdl':
+            tuner = make_tuner('tdl_jobs', 2, MAX_TDL_JOBS, tdl_account()) if auto else None
+            return await download_links(links, args.out, tuner=tuner, **kwargs), tuner
+        # Telethon is only needed (and imported) for the native backend
+        from smart_downloader import native
+        from smart_downloader.client import client_context
+        async with client_context() as client:
+            tuner = None
+            if auto:
+                tuner = make_tuner('native_files', native.PARALLEL_FILES, native.MAX_PARALLEL_FILES,
+                                   await account_key(client))
+            return await download_links(links, args.out, tuner=tuner, client=client, **kwargs), tuner
+
+    try:
+        result, tuner = asyncio.run(download())
+    except KeyboardInterrupt:
+        print('Download cancelled.', file=sys.stderr)
+        sys.exit(130)
+
+    if tuner:
+        print(f'Auto-tune: saved {tuner.finish()} {what} for next time')
+
+    failed = [rc for rc in result.returncodes if rc != 0]
+    if failed:
+        rc = failed[0] or 1
         print('tdl download returned non-zero exit code:', rc, file=sys.stderr)
         sys.exit(rc)
 
+    if result.failed:
+        for item in result.failed:
+            print(f'Failed: {item.item} - {item.error}', file=sys.stderr)
+        print(f'{len(result.failed)} of {len(result.items)} downloads failed.', file=sys.stderr)
+        sys.exit(1)
+
     print('Download finished. Files saved to:', args.out)
 
 
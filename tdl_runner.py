@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+tdl_runner.py
+Async process manager for tdl.
+
+Launches tdl with `asyncio.create_subprocess_exec` (no shell, no string-built
+commands), reads its output as it arrives and turns it into structured events:
+
+- `started`  a file appeared in tdl's progress output
+- `progress` bytes / percent update for a file
+- `done`     a file reached 100% (or tdl reported it as done)
+- `error`    tdl printed an error line
+- `exit`     the process finished (carries the return code)
+
+Many jobs can run side by side under one event loop; `TdlRunner` caps how many
+tdl processes are alive at once and terminates them cleanly when cancelled.
+
+The parser only relies on the shape of tdl's progress lines
+(`<name> ... 42.0% ... 1.2 MB / 3.4 MB`), so a small stub script that prints
+lines like these is enough to exercise it without a Telegram account.
+
+Usage examples:
+  python tdl_runner.py --tdl ./tdl/bin/tdl.exe -- dl -u https://t.me/c/12345/678 -d downloads
+"""
+
+import argparse
+import asyncio
+import codecs
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import tracing
+from autotune import AdjustableLimiter
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+PERCENT_RE = re.compile(r'(?P<pct>\d{1,3}(?:\.\d+)?)\s*%')
+SIZE_PAIR_RE = re.compile(
+    r'(?P<done>\d+(?:\.\d+)?\s*[KMGT]?i?B)\s*/\s*(?P<total>\d+(?:\.\d+)?\s*[KMGT]?i?B)',
+    re.IGNORECASE,
+)
+ERROR_RE = re.compile(r'^(?:error|fatal)\b[:\s]*(?P<msg>.*)$', re.IGNORECASE)
+DONE_RE = re.compile(r'\bdone!?\s*$', re.IGNORECASE)
+
+UNITS = {
+    'b': 1,
+    'kb': 1000, 'mb': 1000 ** 2, 'gb': 1000 ** 3, 'tb': 1000 ** 4,
+    'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3, 'tib': 1024 ** 4,
+}
+
+
+def parse_size(text):
+    """Convert a human size such as '1.5 MB' or '300KiB' to bytes."""
+    m = re.match(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?i?B)\s*$', text, re.IGNORECASE)
+    if not m:
+        return None
+    return int(float(m.group(1)) * UNITS[m.group(2).lower()])
+
+
+@dataclass
+class TdlEvent:
+    kind: str
+    job: str
+    name: Optional[str] = None
+    done: Optional[int] = None
+    total: Optional[int] = None
+    percent: Optional[float] = None
+    message: Optional[str] = None
+    returncode: Optional[int] = None
+
+
+@dataclass
+class TdlJob:
+    args: List[str]
+    name: str = ''
+
+
+@dataclass
+class TdlResult:
+    job: TdlJob
+    returncode: Optional[int] = None
+    files_done: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    cancelled: bool = False
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.cancelled
+
+
+class LineParser:
+    """Stateful parser turning tdl output lines into `TdlEvent`s for one job."""
+
+    def __init__(self, job_name):
+        self.job_name = job_name
+        self.seen = set()
+        self.finished = set()
+
+    def feed(self, line):
+        line = ANSI_RE.sub('', line).strip()
+        if not line:
+            return []
+
+        m = ERROR_RE.match(line)
+        if m:
+            return [TdlEvent('error', self.job_name, message=m.group('msg') or line)]
+
+        pct_match = PERCENT_RE.search(line)
+        size_match = SIZE_PAIR_RE.search(line)
+        done_match = DONE_RE.search(line)
+        if not (pct_match or size_match or done_match):
+            return []
+
+        # The file name is whatever precedes the first progress marker
+        cut = min(m.start() for m in (pct_match, size_match, done_match) if m)
+        name = line[:cut].strip(' .:-[]>') or None
+        if name is None:
+            return []
+
+        events = []
+        if name not in self.seen:
+            self.seen.add(name)
+            events.append(TdlEvent('started', self.job_name, name=name))
+
+        percent = float(pct_match.group('pct')) if pct_match else None
+        done = total = None
+        if size_match:
+            done = parse_size(size_match.group('done'))
+            total = parse_size(size_match.group('total'))
+            if percent is None and total:
+                percent = done * 100.0 / total
+
+        if percent is not None or done is not None:
+            events.append(TdlEvent('progress', self.job_name, name=name,
+                                   done=done, total=total, percent=percent))
+
+        finished = done_match or (percent is not None and percent >= 100.0)
+        if finished and name not in self.finished:
+            self.finished.add(name)
+            events.append(TdlEvent('done', self.job_name, name=name, done=total or done, total=total))
+        return events
+
+
+async def iter_lines(stream, chunk_size=4096, on_chunk=None):
+    """Yield lines from a stream, treating both '\\r' and '\\n' as line ends.
+
+    tdl redraws its progress bars with carriage returns, so splitting on
+    newlines alone would hold back every update until the file finished.
+    `on_chunk` receives the decoded text as it arrives, before it is split, so
+    prompts without a line end are not held back either.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+        text = decoder.decode(chunk)
+        if on_chunk and text:
+            on_chunk(text)
+        pending += text
+        parts = re.split(r'\r\n|\r|\n', pending)
+        pending = parts.pop()
+        for part in parts:
+            yield part
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+class TdlRunner:
+    """Run tdl jobs concurrently under one event loop.
+
+    Args:
+        tdl: Path to the tdl executable
+        max_concurrency: Maximum number of tdl processes alive at once
+        on_event: Optional callback receiving every `TdlEvent`
+        echo: Pass tdl's raw output through to stdout as it arrives (progress
+              redraws and prompts included)
+    """
+
+    def __init__(self, tdl, max_concurrency=2, on_event: Optional[Callable[[TdlEvent], None]] = None,
+                 echo=False, terminate_timeout=5.0):
+        self.tdl = tdl
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.on_event = on_event
+        self.echo = echo
+        self.terminate_timeout = terminate_timeout
+        self._limiter = AdjustableLimiter(self.max_concurrency)
+
+    def _emit(self, event):
+        if self.on_event:
+            self.on_event(event)
+
+    @staticmethod
+    def _echo(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    async def _stop(self, proc):
+        if proc.returncode is not None:
+            return
+        try:
+            proc.terminate()
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(proc.wait(), self.terminate_timeout)
+        except asyncio.TimeoutError:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                return
+            await proc.wait()
+
+    def set_concurrency(self, limit):
+        """Change how many tdl processes may run at once (running ones are not stopped)."""
+        self.max_concurrency = max(1, int(limit))
+        self._limiter.set_limit(self.max_concurrency)
+
+    async def run(self, job):
+        """Run a single job, waiting for a free slot first."""
+        async with self._limiter:
+            return await self._run(job)
+
+    async def _run(self, job):
+        job_name = job.name or ' '.join(job.args[:2])
+        with tracing.span(f'tdl {job_name}', cat='tdl', args=' '.join(job.args)):
+            return await self._run_traced(job, job_name)
+
+    async def _run_traced(self, job, job_name):
+        result = TdlResult(job)
+        parser = LineParser(job_name)
+
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.tdl, *job.args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+        except OSError as e:
+            result.returncode = 1
+            result.errors.append(str(e))
+            self._emit(TdlEvent('error', job_name, message=str(e)))
+            self._emit(TdlEvent('exit', job_name, returncode=1))
+            return result
+
+        try:
+            started = {}
+            async for line in iter_lines(proc.stdout, on_chunk=self._echo if self.echo else None):
+                for event in parser.feed(line):
+                    if event.kind == 'started':
+                        started[event.name] = tracing.now()
+                    elif event.kind == 'done':
+                        result.files_done.append(event.name)
+                        # tdl reports files inside one process, so draw them as spans on the job's track
+                        tracing.complete(f'file {event.name}', started.pop(event.name, tracing.now()),
+                                         tracing.now(), cat='item', bytes=event.total)
+                    elif event.kind == 'error':
+                        result.errors.append(event.message)
+                    self._emit(event)
+            result.returncode = await proc.wait()
+        except asyncio.CancelledError:
+            result.cancelled = True
+            await asyncio.shield(self._stop(proc))
+            raise
+        finally:
+            if proc.returncode is None:
+                await self._stop(proc)
+
+        self._emit(TdlEvent('exit', job_name, returncode=result.returncode))
+        return result
+
+    async def run_all(self, jobs):
+        """Run all jobs, at most `max_concurrency` at a time.
+
+        Cancelling the awaiting task terminates every running tdl process.
+        """
+        tasks = [asyncio.ensure_future(self.run(job)) for job in jobs]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+async def arun_jobs(tdl, jobs, max_concurrency=2, on_event=None, echo=False, tuner=None):
+    """Run jobs on the current event loop; see `run_jobs`."""
+    if tuner is not None:
+        max_concurrency = tuner.value
+
+    def handle(event):
+        if tuner is not None and event.kind == 'done':
+            tuner.record(event.total or event.done or 0)
+        if on_event:
+            on_event(event)
+
+    runner = TdlRunner(tdl, max_concurrency=max_concurrency, on_event=handle, echo=echo)
+    if tuner is None:
+        return await runner.run_all(jobs)
+    with tuner.bind(runner.set_concurrency):
+        return await runner.run_all(jobs)
+
+
+def run_jobs(tdl, jobs, max_concurrency=2, on_event=None, echo=False, tuner=None):
+    """Blocking helper for scripts that are not async themselves.
+
+    With an `autotune.AutoTuner`, the number of parallel tdl processes follows
+    the tuner, which is fed the bytes of every finished file.
+    """
+    return asyncio.run(arun_jobs(tdl, jobs, max_concurrency, on_event, echo, tuner))
+
+
+def print_event(event):
+    """Default console reporter for `TdlEvent`s."""
+    if event.kind == 'started':
+        print(f'[{event.job}] started: {event.name}', flush=True)
+    elif event.kind == 'done':
+        print(f'[{event.job}] done: {event.name}', flush=True)
+    elif event.kind == 'error':
+        print(f'[{event.job}] error: {event.message}', file=sys.stderr, flush=True)
+    elif event.kind == 'exit':
+        print(f'[{event.job}] exited with code {event.returncode}', flush=True)
+
+
+def main():
+    p = argparse.ArgumentParser(description='Run a tdl command and print structured progress events')
+    p.add_argument('--tdl', required=True, help='Path to the tdl executable')
+    p.add_argument('args', nargs=argparse.REMAINDER, help='Arguments passed to tdl (after --)')
+    args = p.parse_args()
+
+    tdl_args = args.args[1:] if args.args[:1] == ['--'] else args.args
+    if not tdl_args:
+        p.error('no tdl arguments given')
+
+    try:
+        results = run_jobs(args.tdl, [TdlJob(tdl_args, name='tdl')], max_concurrency=1, on_event=print_event)
+    except KeyboardInterrupt:
+        print('Cancelled.', file=sys.stderr)
+        sys.exit(130)
+    sys.exit(results[0].returncode or 0)
+
+
+if __name__ == '__main__':
+    main()
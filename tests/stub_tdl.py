@@ -0,0 +1,42 @@
+"""
+Stand-in for tdl in tests: prints progress the way tdl does
+
+    stub_tdl.py files <name>:<bytes> ...   progress bars redrawn with '\r', then 'done'
+    stub_tdl.py sleep <seconds>            print a line, then sleep (for cancellation)
+    stub_tdl.py fail <code>                print an error line and exit with <code>
+    stub_tdl.py prompt                     print a prompt without a line end, then sleep
+
+Each run starts by printing 'pid <pid>'.
+"""
+import os
+import sys
+import time
+
+
+def main():
+    print(f'pid {os.getpid()}', flush=True)
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == 'files':
+        for spec in args:
+            name, size = spec.rsplit(':', 1)
+            size = int(size)
+            for step in range(0, 5):
+                done = size * step // 4
+                sys.stdout.write(f'\r\x1b[2K{name} ... {done * 100 / size:.1f}% ... {done} B / {size} B')
+                sys.stdout.flush()
+                time.sleep(0.05)
+            sys.stdout.write('\n')
+        print('done!', flush=True)
+    elif command == 'sleep':
+        time.sleep(float(args[0]))
+    elif command == 'fail':
+        print('error: chat not found', flush=True)
+        sys.exit(int(args[0]))
+    elif command == 'prompt':
+        sys.stdout.write('Continue? [y/N] ')
+        sys.stdout.flush()
+        time.sleep(30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import json
+import os
+
+import pytest
+
+from export_stream import filter_export, iter_messages, make_predicate, read_header, split_export, write_export
+
+MESSAGES = [
+    {'id': 411, 'type': 'message', 'file': 'lecture {1}.mp4', 'text': 'braces } { and "quotes" \\ in strings'},
+    {'id': 412, 'type': 'message', 'file': '', 'text': 'Física – 物理 – 🎓', 'nested': {'a': [1, {'b': None}]}},
+    {'id': 413, 'type': 'message', 'file': 'notes.pdf', 'size': 1234567890, 'ratio': -1.5e-3},
+]
+
+
+def write_raw(tmp_path, text, name='export.json'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def export(tmp_path):
+    # tdl-like layout with whitespace, plus a field after the messages
+    text = '{\n  "id": 1234567890,\n  "messages": [\n    %s\n  ],\n  "extra": "after"\n}\n' % (
+        ',\n    '.join(json.dumps(m, ensure_ascii=False) for m in MESSAGES))
+    return write_raw(tmp_path, text)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 16, 64, 4096])
+def test_iter_messages_any_chunk_size(export, chunk_size):
+    assert list(iter_messages(export, chunk_size)) == MESSAGES
+
+
+def test_number_split_across_chunks(tmp_path):
+    # Bare numbers can end exactly at a chunk boundary and continue in the next one
+    path = write_raw(tmp_path, '{"messages":[1234567,89,{"id":12345}],"id":9876543210}')
+    for chunk_size in range(1, 40):
+        assert list(iter_messages(path, chunk_size)) == [1234567, 89, {'id': 12345}]
+
+
+def test_empty_export(tmp_path):
+    assert list(iter_messages(write_raw(tmp_path, '{}'))) == []
+    assert list(iter_messages(write_raw(tmp_path, '{"id": 1, "messages": [ ]}'))) == []
+
+
+def test_read_header(export):
+    assert read_header(export) == {'id': 1234567890, 'extra': 'after'}
+    assert read_header(export, ['id']) == {'id': 1234567890}
+
+
+def test_read_header_stops_early(tmp_path):
+    # Nothing after the first message is read when only `id` is wanted
+    path = write_raw(tmp_path, '{"id": 42, "messages": [{"id": 1}, this is not json')
+    assert read_header(path, ['id']) == {'id': 42}
+    with pytest.raises(ValueError):
+        read_header(path)
+
+
+def test_truncated_export_raises(export):
+    with open(export, 'r', encoding='utf-8') as fh:
+        text = fh.read().rstrip()
+    for cut in range(1, len(text)):
+        path = export + '.cut'
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(text[:cut])
+        with pytest.raises(ValueError):
+            list(iter_messages(path, 5))
+
+
+def test_write_and_filter_export(tmp_path, export):
+    out = str(tmp_path / 'copy.json')
+    assert write_export(out, 77, iter(MESSAGES)) == len(MESSAGES)
+    assert read_header(out) == {'id': 77}
+    assert list(iter_messages(out)) == MESSAGES
+
+    videos = str(tmp_path / 'videos.json')
+    assert filter_export(export, videos, make_predicate(ext=['.MP4'])) == 1
+    assert read_header(videos) == {'id': 1234567890}
+    assert [m['id'] for m in iter_messages(videos)] == [411]
+    assert not os.path.exists(f'{videos}.tmp')
+
+
+def test_split_export(tmp_path):
+    src = str(tmp_path / 'export.json')
+    write_export(src, 5, ({'id': i} for i in range(1, 8)))
+
+    paths = split_export(src, 3, tmp_path / 'shards')
+    assert [os.path.basename(p) for p in paths] == [f'export_part{i}of3.json' for i in (1, 2, 3)]
+    assert [[m['id'] for m in iter_messages(p)] for p in paths] == [[1, 4, 7], [2, 5], [3, 6]]
+    assert all(read_header(p) == {'id': 5} for p in paths)
+    assert sorted(os.listdir(tmp_path / 'shards')) == sorted(os.path.basename(p) for p in paths)
+
+
+def test_split_export_more_shards_than_messages(tmp_path):
+    src = str(tmp_path / 'export.json')
+    write_export(src, 5, [{'id': 1}])
+    paths = split_export(src, 3)
+    assert [list(iter_messages(p)) for p in paths] == [[{'id': 1}], [], []]
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+errors = pytest.importorskip('telethon.errors')
+
+from retry_engine import (FILE_REFERENCE, FLOOD, PERMANENT, TRANSIENT, RetryEngine, RetryPolicy, SkipItem,
+                          classify_error, describe_error, summarize)
+
+FAST = RetryPolicy(base_delay=0.01, max_delay=0.05)
+
+
+def flood_wait(seconds):
+    return errors.FloodWaitError(request=None, capture=seconds)
+
+
+def run(engine, items):
+    return asyncio.run(engine.run(items))
+
+
+def test_classify_error():
+    assert classify_error(ConnectionError('reset')) == TRANSIENT
+    assert classify_error(asyncio.TimeoutError()) == TRANSIENT
+    assert classify_error(flood_wait(5)) == FLOOD
+    assert classify_error(errors.FileReferenceExpiredError(request=None)) == FILE_REFERENCE
+    assert classify_error(errors.ChatForwardsRestrictedError(request=None)) == PERMANENT
+    # Only network errors are transient, not every OSError
+    assert classify_error(FileNotFoundError('video.mp4')) == PERMANENT
+    assert classify_error(ValueError('bad id')) == PERMANENT
+
+
+def test_transient_error_is_deferred():
+    calls = []
+    failed = set()
+
+    async def worker(item):
+        calls.append(item)
+        if item == 2 and item not in failed:
+            failed.add(item)
+            raise ConnectionError('reset')
+        return item * 10
+
+    retries = []
+    outcomes = run(RetryEngine(worker, FAST, on_retry=lambda *args: retries.append(args[:3])), [1, 2, 3, 4])
+
+    # The main pipeline moves on; the failed item is retried from the deferred queue
+    assert calls == [1, 2, 3, 4, 2]
+    assert [(o.item, o.status, o.attempts, o.result) for o in outcomes] == [
+        (1, 'ok', 1, 10), (2, 'ok', 2, 20), (3, 'ok', 1, 30), (4, 'ok', 1, 40)]
+    assert retries == [(2, 1, TRANSIENT)]
+    assert outcomes[1].error is None
+
+
+def test_max_attempts():
+    async def worker(item):
+        raise ConnectionError('down')
+
+    retries = []
+    outcomes = run(RetryEngine(worker, RetryPolicy(max_attempts=3, base_delay=0.01),
+                               on_retry=lambda *args: retries.append(args[1])), ['a'])
+
+    assert (outcomes[0].status, outcomes[0].attempts, outcomes[0].error_class) == ('failed', 3, TRANSIENT)
+    assert retries == [1, 2]
+
+
+def test_permanent_error_fails_at_once():
+    async def worker(item):
+        raise errors.ChatForwardsRestrictedError(request=None)
+
+    final = []
+    outcomes = run(RetryEngine(worker, FAST, on_outcome=final.append), [7])
+
+    assert (outcomes[0].status, outcomes[0].attempts, outcomes[0].error_class) == ('failed', 1, PERMANENT)
+    assert describe_error(outcomes[0]) == 'Source chat has forwarding protection'
+    assert final == outcomes
+
+
+def test_skip_item():
+    async def worker(item):
+        if item % 2:
+            raise SkipItem()
+        return item
+
+    outcomes = run(RetryEngine(worker, FAST, concurrency=2), [1, 2, 3, 4])
+
+    assert [o.status for o in outcomes] == ['skipped', 'ok', 'skipped', 'ok']
+    assert summarize(outcomes) == {'ok': 2, 'failed': 0, 'skipped': 2}
+
+
+def test_flood_wait_pauses_pipeline():
+    started = {}
+    flooded = []
+
+    async def worker(item):
+        started.setdefault(item, time.monotonic())
+        if item == 1 and not flooded:
+            flooded.append(item)
+            raise flood_wait(0)  # Waits seconds + 1
+        return item
+
+    begin = time.monotonic()
+    outcomes = run(RetryEngine(worker, FAST), [1, 2, 3])
+
+    assert [(o.status, o.attempts) for o in outcomes] == [('ok', 2), ('ok', 1), ('ok', 1)]
+    # Everyone shares the account's flood limit, so the next item waits too
+    assert started[2] - begin >= 0.9
+
+
+def test_flood_wait_over_limit_fails():
+    async def worker(item):
+        raise flood_wait(3600)
+
+    outcomes = run(RetryEngine(worker, RetryPolicy(max_flood_wait=60)), [1])
+
+    assert (outcomes[0].status, outcomes[0].attempts, outcomes[0].error_class) == ('failed', 1, FLOOD)
+
+
+def test_file_reference_refresh():
+    refreshed = []
+
+    async def worker(item):
+        if not refreshed:
+            raise errors.FileReferenceExpiredError(request=None)
+        return item
+
+    async def refresh(item):
+        refreshed.append(item)
+
+    outcomes = run(RetryEngine(worker, FAST, refresh=refresh), ['m1'])
+
+    assert refreshed == ['m1']
+    assert (outcomes[0].status, outcomes[0].attempts) == ('ok', 2)
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+from tdl_runner import LineParser, TdlJob, TdlRunner, parse_size
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_tdl.py')
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='the stub tdl is a shell script')
+
+
+@pytest.fixture
+def tdl(tmp_path):
+    """An executable that runs stub_tdl.py, passed to TdlRunner like tdl.exe"""
+    path = tmp_path / 'tdl'
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{STUB}" "$@"\n')
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def run(runner, jobs):
+    return asyncio.run(runner.run_all(jobs))
+
+
+def test_parse_size():
+    assert parse_size('1.5 MB') == 1500000
+    assert parse_size('300KiB') == 300 * 1024
+    assert parse_size('12 B') == 12
+    assert parse_size('fast') is None
+
+
+def test_line_parser():
+    parser = LineParser('job1')
+    events = parser.feed('\x1b[2Kvideo.mp4 ... 50.0% ... 1.0 MB / 2.0 MB')
+    assert [e.kind for e in events] == ['started', 'progress']
+    assert events[1].name == 'video.mp4'
+    assert (events[1].done, events[1].total, events[1].percent) == (1000000, 2000000, 50.0)
+
+    events = parser.feed('video.mp4 ... 100.0% ... 2.0 MB / 2.0 MB')
+    assert [e.kind for e in events] == ['progress', 'done']
+    assert events[1].done == 2000000
+    # A finished file is reported once, even if tdl redraws it
+    assert [e.kind for e in parser.feed('video.mp4 ... 100.0% ... 2.0 MB / 2.0 MB')] == ['progress']
+
+    events = parser.feed('Error: chat not found')
+    assert [(e.kind, e.message) for e in events] == [('error', 'chat not found')]
+    assert parser.feed('Logging in...') == []
+
+
+def test_events_from_process(tdl):
+    events = []
+    results = run(TdlRunner(tdl, on_event=events.append), [TdlJob(['files', 'a.bin:4000', 'b.bin:800'], 'job1')])
+
+    assert results[0].ok
+    assert results[0].files_done == ['a.bin', 'b.bin']
+    done = [e for e in events if e.kind == 'done']
+    assert [(e.name, e.total) for e in done] == [('a.bin', 4000), ('b.bin', 800)]
+    # '\r' redraws arrive as separate progress updates
+    assert len([e for e in events if e.kind == 'progress' and e.name == 'a.bin']) == 5
+    assert events[-1].kind == 'exit' and events[-1].returncode == 0
+
+
+def test_error_and_returncode(tdl):
+    events = []
+    results = run(TdlRunner(tdl, on_event=events.append), [TdlJob(['fail', '3'], 'job1')])
+
+    assert results[0].returncode == 3 and not results[0].ok
+    assert results[0].errors == ['chat not found']
+    assert events[-1].kind == 'exit' and events[-1].returncode == 3
+
+
+def test_concurrency_cap(tdl):
+    running = set()
+    peak = []
+
+    def on_event(event):
+        if event.kind == 'started':
+            running.add(event.job)
+            peak.append(len(running))
+        elif event.kind == 'exit':
+            running.discard(event.job)
+
+    jobs = [TdlJob(['files', f'f{i}.bin:1000'], f'job{i}') for i in range(6)]
+    results = run(TdlRunner(tdl, max_concurrency=2, on_event=on_event), jobs)
+
+    assert all(r.ok for r in results)
+    assert max(peak) == 2
+
+
+def test_cancel_terminates_processes(tdl, monkeypatch):
+    pids = []
+    feed = LineParser.feed
+
+    def spy(self, line):
+        if line.startswith('pid '):
+            pids.append(int(line.split()[1]))
+        return feed(self, line)
+
+    monkeypatch.setattr(LineParser, 'feed', spy)
+
+    async def main():
+        runner = TdlRunner(tdl, max_concurrency=2, terminate_timeout=2.0)
+        task = asyncio.ensure_future(runner.run_all([TdlJob(['sleep', '30'], f'job{i}') for i in range(3)]))
+        # Wait for both allowed processes to be up
+        deadline = time.monotonic() + 10
+        while len(pids) < 2 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    started = time.monotonic()
+    asyncio.run(main())
+
+    assert len(pids) == 2  # The third job never got a slot
+    assert time.monotonic() - started < 10
+    for pid in pids:
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
+
+
+def test_echo_passes_prompts_through(tdl, monkeypatch):
+    chunks = []
+    monkeypatch.setattr(TdlRunner, '_echo', staticmethod(chunks.append))
+
+    async def main():
+        task = asyncio.ensure_future(TdlRunner(tdl, echo=True, terminate_timeout=2.0).run(TdlJob(['prompt'], 'job1')))
+        deadline = time.monotonic() + 10
+        while 'Continue?' not in ''.join(chunks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    # The prompt has no line end, but is shown while tdl is still waiting
+    assert ''.join(chunks).endswith('Continue? [y/N] ')
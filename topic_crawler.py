@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Forum Topic Crawler
+List the topics of a forum chat and collect each topic's messages for tdl
+
+Topics are paged through concurrently (messages of a topic are the replies to
+its top message). The result can be written as:
+- a link list (https://t.me/c/<chat>/<topic>/<msg>) for `tdl_downloader.py --file`
+- a tdl export JSON for `tdl dl -f` / `tdl_downloader.py --export`
+
+With --sync, the highest message ID seen per topic is remembered, so the next
+run only picks up new messages.
+"""
+import asyncio
+import json
+import os
+from telethon import TelegramClient
+from telethon.tl import functions
+from telethon.tl.types import ForumTopicDeleted
+
+import tracing
+from export_stream import write_export
+from smart_downloader.links import to_peer_id
+
+# Import configuration
+try:
+    from config import API_ID, API_HASH
+    SESSION_NAME = 'video_uploader'  # Use existing authenticated session
+except ImportError:
+    print("❌ ERROR: config.py not found!")
+    print("Please create config.py with your API credentials")
+    exit(1)
+
+# Topic 1 is the "General" topic; its messages are not replies to a top message
+GENERAL_TOPIC_ID = 1
+
+def sync_state_path(chat_id):
+    return f"topic_sync_{abs(chat_id)}.json"
+
+def load_sync_state(chat_id):
+    try:
+        with open(sync_state_path(chat_id), 'r', encoding='utf-8') as fh:
+            return {int(k): v for k, v in json.load(fh).items()}
+    except (OSError, ValueError):
+        return {}
+
+def save_sync_state(chat_id, state):
+    path = sync_state_path(chat_id)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump({str(k): v for k, v in sorted(state.items())}, fh, indent=2)
+    os.replace(tmp, path)
+
+async def _forum_topics_page(client, entity, offset_date, offset_id, offset_topic, limit):
+    # Newer layers moved the request from channels.* to messages.* (peer instead of channel)
+    request = getattr(functions.messages, 'GetForumTopicsRequest', None)
+    if request is not None:
+        return await client(request(peer=entity, offset_date=offset_date, offset_id=offset_id,
+                                    offset_topic=offset_topic, limit=limit))
+    return await client(functions.channels.GetForumTopicsRequest(
+        channel=entity, offset_date=offset_date, offset_id=offset_id,
+        offset_topic=offset_topic, limit=limit))
+
+async def list_topics(client, entity, page_size=100):
+    """
+    Return all (non-deleted) forum topics of a chat
+
+    Returns:
+        List of ForumTopic objects (id, title, top_message, ...)
+    """
+    topics = []
+    offset_date, offset_id, offset_topic = None, 0, 0
+    with tracing.span('list topics'):
+        while True:
+            result = await _forum_topics_page(client, entity, offset_date, offset_id, offset_topic, page_size)
+            page = [t for t in result.topics if not isinstance(t, ForumTopicDeleted)]
+            topics.extend(page)
+            if len(result.topics) < page_size or len(topics) >= result.count or not result.topics:
+                break
+            last = result.topics[-1]
+            top_messages = {m.id: m for m in result.messages}
+            top = top_messages.get(getattr(last, 'top_message', 0))
+            offset_topic = last.id
+            offset_id = getattr(last, 'top_message', 0)
+            offset_date = top.date if top else None
+    return topics
+
+async def crawl_topic(client, entity, topic_id, min_id=0, media_only=True):
+    """
+    Collect the messages of one topic, oldest first
+
+    Args:
+        topic_id: Topic ID (the ID of its top message)
+        min_id: Only messages with a higher ID (for incremental sync)
+        media_only: Skip messages without a file
+    """
+    messages = []
+    with tracing.span(f'topic {topic_id}', cat='item'):
+        if topic_id == GENERAL_TOPIC_ID:
+            # General has no top message to reply to: scan and keep non-topic messages
+            async for msg in client.iter_messages(entity, min_id=min_id, reverse=True):
+                reply = msg.reply_to
+                if reply is not None and getattr(reply, 'forum_topic', False):
+                    continue
+                if not media_only or msg.file:
+                    messages.append(msg)
+        else:
+            async for msg in client.iter_messages(entity, reply_to=topic_id, min_id=min_id, reverse=True):
+                if not media_only or msg.file:
+                    messages.append(msg)
+    return messages
+
+async def crawl_topics(client, entity, topic_ids, sync_state=None, media_only=True, concurrency=4):
+    """
+    Crawl several topics concurrently
+
+    Returns:
+        Dict of topic ID -> list of messages
+    """
+    sync_state = sync_state or {}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def crawl(topic_id):
+        async with semaphore:
+            msgs = await crawl_topic(client, entity, topic_id, sync_state.get(topic_id, 0), media_only)
+            print(f"📂 Topic {topic_id}: {len(msgs)} messages")
+            return topic_id, msgs
+
+    return dict(await asyncio.gather(*[crawl(t) for t in topic_ids]))
+
+def message_record(msg, topic_id):
+    """Convert a message to a tdl export record"""
+    return {
+        'id': msg.id,
+        'type': 'message',
+        'file': (msg.file.name or '') if msg.file else '',
+        'date': int(msg.date.timestamp()) if msg.date else 0,
+        'text': msg.message or '',
+        'topic': topic_id,
+    }
+
+async def run_crawler(chat_id, topic_ids=None, links_path=None, export_path=None, sync=False,
+                      media_only=True, concurrency=4, list_only=False):
+    """
+    List topics and write link lists / tdl exports for the selected ones
+
+    Returns:
+        Dict of topic ID -> list of message IDs written
+    """
+    peer_id = to_peer_id(chat_id)
+    link_chat = abs(peer_id) - 1000000000000
+
+    async with tracing.connected(TelegramClient(SESSION_NAME, API_ID, API_HASH)) as client:
+        with tracing.span('get_entity'):
+            entity = await client.get_entity(peer_id)
+        print(f"\n{'='*60}")
+        print(f"🧵 Forum: {getattr(entity, 'title', chat_id)}")
+        print(f"{'='*60}")
+
+        topics = await list_topics(client, entity)
+        titles = {t.id: t.title for t in topics}
+        for t in topics:
+            print(f"  {t.id:>6}  {t.title}")
+        print(f"{'='*60}\n")
+        if list_only:
+            return {}
+
+        selected = topic_ids or [t.id for t in topics if t.id != GENERAL_TOPIC_ID]
+        unknown = [t for t in selected if t not in titles and t != GENERAL_TOPIC_ID]
+        if unknown:
+            print(f"⚠️  Unknown topic IDs (crawled anyway): {unknown}")
+
+        state = load_sync_state(chat_id) if sync else {}
+        results = await crawl_topics(client, entity, selected, state, media_only, concurrency)
+
+    ordered = [(topic_id, msg) for topic_id in selected for msg in results.get(topic_id, [])]
+
+    if links_path:
+        with open(links_path, 'w', encoding='utf-8') as fh:
+            for topic_id, msg in ordered:
+                fh.write(f"https://t.me/c/{link_chat}/{topic_id}/{msg.id}\n")
+        print(f"🔗 Wrote {len(ordered)} links to {links_path}")
+
+    if export_path:
+        with tracing.span('write export'):
+            n = write_export(export_path, link_chat, (message_record(msg, t) for t, msg in ordered))
+        print(f"📄 Wrote {n} messages to {export_path}")
+
+    if sync:
+        for topic_id, msgs in results.items():
+            if msgs:
+                state[topic_id] = max(state.get(topic_id, 0), max(m.id for m in msgs))
+        save_sync_state(chat_id, state)
+        print(f"💾 Sync state saved to {sync_state_path(chat_id)}")
+
+    return {topic_id: [m.id for m in msgs] for topic_id, msgs in results.items()}
+
+if __name__ == '__main__':
+    import argparse
+
+    p = argparse.ArgumentParser(description='List forum topics and collect their messages for tdl')
+    p.add_argument('chat', type=int, help='Chat ID, e.g. 3399205162 or -1003399205162')
+    p.add_argument('--topic', '-t', type=int, action='append', help='Topic ID to crawl (repeatable; default: all)')
+    p.add_argument('--list', action='store_true', help='Only list the topics')
+    p.add_argument('--links', help='Write message links (one per line) to this file')
+    p.add_argument('--export', help='Write a tdl export JSON to this file')
+    p.add_argument('--sync', action='store_true', help='Only new messages since the last --sync run')
+    p.add_argument('--all-messages', action='store_true', help='Include messages without files')
+    p.add_argument('--concurrency', type=int, default=4, help='Topics crawled in parallel')
+    tracing.add_arguments(p)
+    args = p.parse_args()
+    tracing.start(args.trace, args.profile)
+
+    if not (args.list or args.links or args.export):
+        p.error('nothing to do: use --list, --links or --export')
+
+    asyncio.run(run_crawler(
+        args.chat, args.topic, args.links, args.export, args.sync,
+        media_only=not args.all_messages, concurrency=args.concurrency, list_only=args.list,
+    ))
+
+    if args.links:
+        print(f"\nNext: python tdl_downloader.py --file {args.links} --out downloads")
+    if args.export:
+        print(f"\nNext: python tdl_downloader.py --export {args.export} --out downloads")
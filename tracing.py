@@ -0,0 +1,183 @@
+"""
+Phase-level tracing and opt-in profiling
+Records timed spans to a Chrome trace JSON file (open in chrome://tracing or ui.perfetto.dev)
+
+Every entry point accepts:
+  --trace <file.json>     Write timed spans for each phase and item
+  --profile <file.prof>   Dump cProfile stats (inspect with `python -m pstats file.prof` or snakeviz)
+
+Spans opened from different asyncio tasks land on separate tracks, so
+concurrent uploads, forwards and tdl jobs show up side by side.
+When tracing is off, `span()` is a cheap no-op.
+"""
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+
+class Tracer:
+    """Collects Chrome trace events in memory and writes them on save()"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.events = []
+        self.pid = os.getpid()
+        self._t0 = time.perf_counter()
+        self._tracks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def now(self):
+        """Microseconds since the tracer was created"""
+        return (time.perf_counter() - self._t0) * 1e6
+
+    def _track(self):
+        # One track per asyncio task (or thread when no loop is running)
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task else ('thread', threading.get_ident())
+        with self._lock:
+            tid = self._tracks.get(key)
+            if tid is None:
+                tid = len(self._tracks)
+                self._tracks[key] = tid
+                label = task.get_name() if task else threading.current_thread().name
+                self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                                    'args': {'name': label}})
+        return tid
+
+    def complete(self, name, start_us, end_us, cat='phase', tid=None, **args):
+        """Record a finished span with explicit start/end timestamps"""
+        if not self.enabled:
+            return
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': max(0.0, end_us - start_us),
+                 'pid': self.pid, 'tid': self._track() if tid is None else tid}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name, cat='phase', **args):
+        if not self.enabled:
+            yield
+            return
+        tid = self._track()
+        start = self.now()
+        try:
+            yield
+        except BaseException as e:
+            args['error'] = type(e).__name__
+            raise
+        finally:
+            self.complete(name, start, self.now(), cat, tid, **args)
+
+    def instant(self, name, cat='event', **args):
+        if not self.enabled:
+            return
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': self.now(),
+                 'pid': self.pid, 'tid': self._track()}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+
+    def save(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            data = {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+        with open(self.path, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        print(f"📈 Trace written to {self.path}")
+
+
+tracer = Tracer()
+_profiler = None
+
+
+def span(name, cat='phase', **args):
+    """Time a block: `with tracing.span('get_entity'): ...`"""
+    return tracer.span(name, cat, **args)
+
+
+def instant(name, cat='event', **args):
+    tracer.instant(name, cat, **args)
+
+
+def complete(name, start_us, end_us, cat='phase', **args):
+    tracer.complete(name, start_us, end_us, cat, **args)
+
+
+def now():
+    return tracer.now()
+
+
+@asynccontextmanager
+async def connected(client):
+    """Use a TelegramClient like `async with client`, timing the connect phase"""
+    with span('connect'):
+        await client.start()
+    try:
+        yield client
+    finally:
+        with span('disconnect'):
+            await client.disconnect()
+
+
+def _finish():
+    global _profiler
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profiler.dump_path)
+        print(f"📈 Profile written to {_profiler.dump_path}")
+        _profiler = None
+    tracer.save()
+
+
+def start(trace_path=None, profile_path=None):
+    """Enable tracing and/or profiling; results are written when the process exits"""
+    global _profiler
+    if trace_path:
+        tracer.path = trace_path
+    if profile_path:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.dump_path = profile_path
+        _profiler.enable()
+    if trace_path or profile_path:
+        atexit.register(_finish)
+
+
+def add_arguments(parser):
+    """Add --trace/--profile to an argparse parser"""
+    parser.add_argument('--trace', metavar='FILE', help='Write a Chrome/Perfetto trace of phases and items to FILE')
+    parser.add_argument('--profile', metavar='FILE', help='Dump cProfile stats to FILE')
+
+
+def setup_from_argv(argv):
+    """
+    Strip --trace/--profile (and their values) from a sys.argv-style list and start them
+
+    Returns the remaining arguments, for scripts that parse sys.argv by hand.
+    """
+    rest = []
+    options = {'--trace': None, '--profile': None}
+    args = iter(argv)
+    for arg in args:
+        key, sep, value = arg.partition('=')
+        if key in options:
+            options[key] = value if sep else next(args, None)
+        else:
+            rest.append(arg)
+    start(options['--trace'], options['--profile'])
+    return rest
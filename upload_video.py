@@ -4,9 +4,14 @@ Uploads videos as streaming video (not as file) to prevent easy downloads
 """
 import asyncio
 import os
-from telethon import TelegramClient
 from telethon.tl.types import DocumentAttributeVideo
 
+import tracing
+from autotune import AutoTuner, account_key
+from retry_engine import describe_error
+from smart_downloader import client_context, find_videos, upload_files
+from smart_downloader.uploading import MAX_UPLOAD_WORKERS
+
 # Import configuration
 try:
     from config import API_ID, API_HASH, CE_MADE_EASY_CHAT_ID
@@ -43,6 +48,13 @@ def progress_callback(current, total):
     
     print(f"\r🚀 Progress: {percentage:.1f}% | {current_mb:.1f}/{total_mb:.1f} MB | Speed: {speed_mbps:.2f} MB/s", end='', flush=True)
 
+def reset_progress():
+    """Reset progress callback state before a new upload"""
+    if hasattr(progress_callback, 'start_time'):
+        delattr(progress_callback, 'start_time')
+    if hasattr(progress_callback, 'last_update'):
+        delattr(progress_callback, 'last_update')
+
 async def upload_video(video_path, chat_id, caption=''):
     """
     Upload a video file as streaming video to a Telegram chat
@@ -52,128 +64,156 @@ async def upload_video(video_path, chat_id, caption=''):
         chat_id: Chat ID or username
         caption: Optional caption for the video
     """
-    import time
-    async with TelegramClient(SESSION_NAME, API_ID, API_HASH) as client:
-        filename = os.path.basename(video_path)
-        file_size = os.path.getsize(video_path)
-        file_size_mb = file_size / (1024 * 1024)
-        
-        # Use filename as caption if no caption provided
-        if not caption:
-            caption = filename
-        
-        print(f"\n{'='*60}")
-        print(f"📹 Uploading: {filename}")
-        print(f"📊 Size: {file_size_mb:.2f} MB")
-        print(f"💬 Caption: {caption}")
-        print(f"📤 To chat: {chat_id}")
-        print(f"{'='*60}")
-        
-        start_time = time.time()
-        
-        # Reset progress callback state
-        if hasattr(progress_callback, 'start_time'):
-            delattr(progress_callback, 'start_time')
-        if hasattr(progress_callback, 'last_update'):
-            delattr(progress_callback, 'last_update')
-        
-        # Upload as video (not as file)
-        # supports_streaming=True makes it playable inline
-        await client.send_file(
-            chat_id,
-            video_path,
-            caption=caption,
-            supports_streaming=True,  # This makes it a streaming video
-            force_document=False,  # Don't force as document/file
-            progress_callback=progress_callback,
-            attributes=[
-                DocumentAttributeVideo(
-                    duration=0,  # Will be auto-detected
-                    w=1920,  # Width (will be auto-detected)
-                    h=1080,  # Height (will be auto-detected)
-                    supports_streaming=True
-                )
-            ]
-        )
-        
-        print()  # New line after progress
-        end_time = time.time()
-        upload_time = end_time - start_time
-        upload_speed_mbps = file_size_mb / upload_time if upload_time > 0 else 0
-        
-        print(f"✅ Upload complete!")
-        print(f"⏱️  Time: {upload_time:.2f} seconds")
-        print(f"🚀 Speed: {upload_speed_mbps:.2f} MB/s")
+    filename = os.path.basename(video_path)
+    file_size = os.path.getsize(video_path)
+    file_size_mb = file_size / (1024 * 1024)
+    
+    # Use filename as caption if no caption provided
+    if not caption:
+        caption = filename
+    
+    print(f"\n{'='*60}")
+    print(f"📹 Uploading: {filename}")
+    print(f"📊 Size: {file_size_mb:.2f} MB")
+    print(f"💬 Caption: {caption}")
+    print(f"📤 To chat: {chat_id}")
+    print(f"{'='*60}")
+    
+    reset_progress()
+    
+    # Upload as video (not as file)
+    # supports_streaming=True makes it playable inline
+    result = await upload_files(
+        [video_path],
+        chat_id,
+        captions=[caption],
+        progress_callback=progress_callback,
+        attributes=[
+            DocumentAttributeVideo(
+                duration=0,  # Will be auto-detected
+                w=1920,  # Width (will be auto-detected)
+                h=1080,  # Height (will be auto-detected)
+                supports_streaming=True
+            )
+        ],
+        session=SESSION_NAME, api_id=API_ID, api_hash=API_HASH
+    )
+    
+    print()  # New line after progress
+    item = result.items[0]
+    if item.status == 'failed':
+        print(f"❌ Upload failed: {item.error}")
         print(f"{'='*60}\n")
+        return
+    
+    upload_time = item.elapsed
+    upload_speed_mbps = file_size_mb / upload_time if upload_time > 0 else 0
+    
+    print(f"✅ Upload complete!")
+    print(f"⏱️  Time: {upload_time:.2f} seconds")
+    print(f"🚀 Speed: {upload_speed_mbps:.2f} MB/s")
+    print(f"{'='*60}\n")
 
-async def upload_folder(folder_path, chat_id):
-    """Upload all videos from a folder"""
-    import time
-    async with TelegramClient(SESSION_NAME, API_ID, API_HASH) as client:
-        video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv']
-        
-        # Get all video files and sort them by name for sequential upload
-        video_files = []
-        for filename in os.listdir(folder_path):
-            if any(filename.lower().endswith(ext) for ext in video_extensions):
-                video_path = os.path.join(folder_path, filename)
-                video_files.append((filename, video_path))
-        
-        # Sort by filename to maintain sequence
-        video_files.sort(key=lambda x: x[0])
+async def upload_folder(folder_path, chat_id, album=False, auto=False):
+    """
+    Upload all videos from a folder
+
+    Args:
+        folder_path: Folder containing the videos
+        chat_id: Chat ID or username
+        album: Send consecutive videos as albums of up to ALBUM_SIZE
+        auto: Upload several files/albums at once, auto-tuning how many on measured MB/s
+              (messages are still sent in filename order)
+    """
+    # Get all video files, sorted by name to maintain sequence
+    video_files = find_videos(folder_path)
+    total_videos = len(video_files)
+    print(f"\n🎬 Found {total_videos} videos to upload")
+    print(f"📁 Folder: {folder_path}\n")
+    
+    async with client_context(session=SESSION_NAME, api_id=API_ID, api_hash=API_HASH) as client:
+        tuner = None
+        if auto:
+            def on_change(workers):
+                print(f"\n⚙️  Auto-tune: {workers} parallel uploads")
+            
+            tuner = AutoTuner(
+                'album_workers' if album else 'upload_workers', 1, 1, MAX_UPLOAD_WORKERS,
+                window=30.0, account=await account_key(client), destination=str(chat_id),
+                on_change=on_change
+            )
+            print(f"⚙️  Auto-tune: starting with {tuner.value} parallel uploads\n")
         
-        total_videos = len(video_files)
-        print(f"\n🎬 Found {total_videos} videos to upload")
-        print(f"📁 Folder: {folder_path}\n")
+        def label(item):
+            index, members = item
+            first = video_files[members[0]][0]
+            return f"Album {index} ({first} ...)" if album else first
         
-        for index, (filename, video_path) in enumerate(video_files, 1):
-            file_size = os.path.getsize(video_path)
-            file_size_mb = file_size / (1024 * 1024)
-            
+        def on_start(index, total, names, size):
+            size_mb = size / (1024 * 1024)
             print(f"\n{'='*60}")
-            print(f"📹 [{index}/{total_videos}] Uploading: {filename}")
-            print(f"📊 Size: {file_size_mb:.2f} MB")
+            if album:
+                print(f"🗂️  [{index}/{total}] Uploading album of {len(names)} videos")
+                for filename in names:
+                    print(f"   📹 {filename}")
+            else:
+                print(f"📹 [{index}/{total}] Uploading: {names[0]}")
+            print(f"📊 Size: {size_mb:.2f} MB")
             print(f"{'='*60}")
-            
-            start_time = time.time()
-            
-            # Reset progress callback state
-            if hasattr(progress_callback, 'start_time'):
-                delattr(progress_callback, 'start_time')
-            if hasattr(progress_callback, 'last_update'):
-                delattr(progress_callback, 'last_update')
-            
-            await client.send_file(
-                chat_id,
-                video_path,
-                caption=filename,  # Use filename as caption
-                supports_streaming=True,
-                force_document=False,
-                progress_callback=progress_callback
-            )
-            
+            reset_progress()
+        
+        def on_outcome(outcome):
+            if outcome.status == 'failed':
+                print(f"\n❌ {label(outcome.item)}: Failed - {describe_error(outcome)}")
+                return
+            size_mb = sum(os.path.getsize(video_files[i][1]) for i in outcome.item[1]) / (1024 * 1024)
+            upload_speed_mbps = size_mb / outcome.elapsed if outcome.elapsed > 0 else 0
             print()  # New line after progress
-            end_time = time.time()
-            upload_time = end_time - start_time
-            upload_speed_mbps = file_size_mb / upload_time if upload_time > 0 else 0
-            
-            print(f"✅ Upload complete!")
-            print(f"⏱️  Time: {upload_time:.2f} seconds")
+            print(f"✅ {'Album sent' if album else 'Upload complete'}! ({label(outcome.item)})")
+            print(f"⏱️  Time: {outcome.elapsed:.2f} seconds")
             print(f"🚀 Speed: {upload_speed_mbps:.2f} MB/s")
             print(f"{'='*60}\n")
         
-        print(f"\n🎉 All {total_videos} videos uploaded successfully!")
+        def on_retry(item, attempt, error_class, error, delay):
+            print(f"\n🔁 {label(item)}: {error_class} error on attempt {attempt}, retrying in {delay:.1f}s")
+        
+        # A failed upload does not abort the folder; transient errors are retried later
+        result = await upload_files(
+            [path for _, path in video_files], chat_id,
+            album=album, tuner=tuner, progress_callback=progress_callback,
+            on_start=on_start, on_outcome=on_outcome, on_retry=on_retry, client=client
+        )
+        
+        if tuner:
+            print(f"\n⚙️  Auto-tune: saved {tuner.finish()} parallel uploads for next time")
+        
+        if result.failed:
+            print(f"\n⚠️  {len(result.succeeded)}/{total_videos} videos uploaded. Failed:")
+            for item in result.failed:
+                print(f"   ❌ {os.path.basename(item.item)} - {item.error}")
+        elif album:
+            print(f"\n🎉 All {total_videos} videos uploaded successfully in {result.albums} albums!")
+        else:
+            print(f"\n🎉 All {total_videos} videos uploaded successfully!")
 
 if __name__ == '__main__':
     import sys
     
+    sys.argv = tracing.setup_from_argv(sys.argv)
+    
     if len(sys.argv) < 3:
         print("Usage:")
         print("  Single file: python upload_video.py <video_path> <chat_id>")
         print("  Folder:      python upload_video.py <folder_path> <chat_id> --folder")
+        print("  Albums:      python upload_video.py <folder_path> <chat_id> --folder --album")
+        print("  Auto-tuned:  python upload_video.py <folder_path> <chat_id> --folder --auto")
         print("\nExample:")
         print('  python upload_video.py "E:\\telegram\\downloads\\video.mp4" 3305131927')
         print('  python upload_video.py "E:\\telegram\\downloads" 3305131927 --folder')
+        print('  python upload_video.py "E:\\telegram\\downloads" 3305131927 --folder --album')
+        print("\nOptions:")
+        print("  --trace <file.json>    Write a Chrome/Perfetto trace of each phase and upload")
+        print("  --profile <file.prof>  Dump cProfile stats")
         sys.exit(1)
     
     path = sys.argv[1]
@@ -185,7 +225,9 @@ if __name__ == '__main__':
     except ValueError:
         chat_id = chat  # Keep as username if not a number
     
-    if len(sys.argv) > 3 and sys.argv[3] == '--folder':
-        asyncio.run(upload_folder(path, chat_id))
+    flags = sys.argv[3:]
+    
+    if '--folder' in flags:
+        asyncio.run(upload_folder(path, chat_id, album='--album' in flags, auto='--auto' in flags))
     else:
         asyncio.run(upload_video(path, chat_id))